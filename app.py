@@ -1,9 +1,39 @@
 import customtkinter as ctk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import tkinter as tk
 import sqlite3
-import hashlib
-from datetime import datetime
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import argparse
+import os
+import sys
+import shutil
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from PIL import Image
+
+# 所有 SQL 都在 repository (不依賴 Tk), 畫面只負責顯示與把 job 丟給 DBWorker
+from repository import (
+    DB_PATH, ISSUE_PAGE_SIZE, STATS_DIMENSIONS, ISSUE_LIST_COLUMNS,
+    HIT_START, HIT_END, IMAGE_EXTENSIONS,
+    open_connection, connect, data_version, latest_change_seq, read_changes, prune_change_log, CHANGE_LOG_TABLES,
+    authenticate, register_user, list_usernames, UserIndex,
+    issue_sort_phases, list_issues, get_issues, create_issue, bulk_update_issues, bulk_update_matching, load_issue_stats,
+    normalize_date, list_timeline, OPEN_STATUSES, TIMELINE_MAX_ROWS,
+    import_issues, export_issues, search_all, sync_databases, sync_directory, reset_site_id,
+    get_start_page, list_wiki_revisions, save_wiki_page, load_wiki_revision,
+    list_attachments, get_attachments, store_attachment, add_attachment,
+    attachment_path, thumbnail_path, make_thumbnail, thumbnail_pool, shutdown_thumbnail_pool,
+)
+# 不開 GUI 的本機 JSON API (app.py serve)
+from server import serve, API_PORT, API_READERS
+# 效能量測 (MTD_PROFILE=1 才啟用)
+import instrumentation
+from instrumentation import timed
 
 # --- 設定全域外觀 ---
 ctk.set_appearance_mode("Light") # 改成淺色模式比較像網頁
@@ -14,6 +44,201 @@ REDMINE_BLUE = "#3E5B76"
 REDMINE_LIGHT_BLUE = "#628DB6"
 HEADER_TEXT_COLOR = "white"
 
+# 分頁快取: 最多保留幾個分頁的畫面 (超過時關掉最久沒用的)
+MAX_CACHED_VIEWS = 4
+
+# Issues 列表分頁設定 (只載入可見範圍 + 預載緩衝, 每頁筆數見 ISSUE_PAGE_SIZE)
+ISSUE_PREFETCH_ROWS = 40   # 捲到距離底部 (或頂端) 剩這麼多列時, 預先載入下一頁 (或上一頁)
+ISSUE_WINDOW_ROWS = 5 * ISSUE_PAGE_SIZE  # 最多保留幾列; 超過時丟掉離可見範圍最遠的一端, 捲回去時再重新查詢
+
+# 資料庫設定
+DB_POLL_MS = 20            # UI 執行緒檢查背景查詢結果的間隔 (毫秒)
+CHANGE_POLL_MS = 1000      # 檢查其他程式是否改過資料庫的間隔 (毫秒)
+
+# ============================
+# 0. 背景資料庫執行緒 (DB Worker)
+# ============================
+class DBWorker:
+    """在背景執行緒上執行 SQL, 結果用 after() 送回 Tk 主執行緒。
+
+    讀取與寫入各有一個執行緒和連線 (WAL 模式): submit() 的查詢不會排在
+    匯入、存檔之類的寫入後面, 寫入則依序在 submit_write() 的執行緒上執行。
+    job 是 job(conn) 形式的函式, 在背景執行緒執行;
+    callback(result) / errback(error) 則一定在 UI 執行緒執行, 可以安全操作元件。
+
+    寫入後用 notify(table, op, ids) 發出變更事件, 訂閱者只需修補受影響的列;
+    其他程式 (共用同一個 DB 檔) 的變更則靠 PRAGMA data_version + change_log 取得。
+    """
+    def __init__(self, tk_root, db_path):
+        self.root = tk_root
+        self.db_path = db_path
+        self.jobs = queue.Queue()
+        self.write_jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.listeners = {}
+        self.data_version = None
+        self.last_change_seq = 0
+        self.reader = threading.Thread(target=self._run, args=(self.jobs, False), name="db-reader", daemon=True)
+        self.writer = threading.Thread(target=self._run, args=(self.write_jobs, True), name="db-writer", daemon=True)
+        self.reader.start()
+        self.writer.start()
+        self._poll()
+        self._watch_changes()
+
+    def submit(self, job, callback=None, errback=None):
+        # 唯讀查詢
+        self.jobs.put((job, callback, errback))
+
+    def submit_write(self, job, callback=None, errback=None):
+        # 會寫入的 job (依送出順序執行, 每個寫入都是 write_transaction 短交易)
+        self.write_jobs.put((job, callback, errback))
+
+    def submit_background(self, job, callback=None, errback=None):
+        # 很久的唯讀 job (例如匯出整個資料庫): 用自己的執行緒與連線, 不要讓 submit() 的查詢排在後面
+        def run():
+            conn = open_connection(self.db_path)
+            try:
+                result = job(conn)
+            except Exception as e:
+                self.post(errback or self._show_error, e)
+            else:
+                if callback:
+                    self.post(callback, result)
+            finally:
+                conn.close()
+        threading.Thread(target=run, name="db-background", daemon=True).start()
+
+    def post(self, callback, *args):
+        # 從背景執行緒安排一個 UI 回呼 (例如進度更新)
+        self.results.put((callback, args))
+
+    def stop(self):
+        self.jobs.put(None)
+        self.write_jobs.put(None)
+
+    def subscribe(self, table, listener):
+        # listener(op, ids) 會在 UI 執行緒被呼叫, op 為 insert / update / delete,
+        # 或 reload (ids 為空: 落後太多, 中間的變更已被清掉, 需要整個重新載入)
+        self.listeners.setdefault(table, []).append(listener)
+
+    def unsubscribe(self, table, listener):
+        if listener in self.listeners.get(table, []):
+            self.listeners[table].remove(listener)
+
+    def notify(self, table, op, ids):
+        # 任何執行緒都可以呼叫 (通常是在 job 內寫入之後)
+        self.post(self._dispatch, table, op, list(ids))
+
+    def _dispatch(self, table, op, ids):
+        for listener in list(self.listeners.get(table, [])):
+            listener(op, ids)
+
+    def _watch_changes(self):
+        self.submit(self._read_external_changes)
+        self.root.after(CHANGE_POLL_MS, self._watch_changes)
+
+    def _read_external_changes(self, conn):
+        # data_version 只在「其他連線」提交後才會變, 沒變就不必掃任何表。
+        # 自己的寫入連線對讀取連線來說也是「其他連線」, 所以自己的變更會再通知一次;
+        # 訂閱者都是依 id 重新查詢後修補, 重複通知只是多一次小查詢。
+        version = data_version(conn)
+        if version == self.data_version:
+            return
+        self.data_version = version
+        self.last_change_seq, grouped = read_changes(conn, self.last_change_seq)
+        if grouped is None:
+            for tbl in CHANGE_LOG_TABLES:
+                self.notify(tbl, "reload", [])
+            return
+        for (tbl, op), ids in grouped.items():
+            self.notify(tbl, op, ids)
+
+    def _run(self, jobs, writer):
+        conn = open_connection(self.db_path)
+        if not writer:
+            self.data_version = data_version(conn)
+            self.last_change_seq = latest_change_seq(conn)
+        while True:
+            item = jobs.get()
+            if item is None:
+                break
+            job, callback, errback = item
+            started = time.perf_counter()
+            try:
+                result = job(conn)
+            except Exception as e:
+                conn.rollback()
+                self.post(errback or self._show_error, e)
+                continue
+            finally:
+                if instrumentation.ENABLED:
+                    instrumentation.stats.record("job", job_name(job), (time.perf_counter() - started) * 1000)
+            if callback:
+                self.post(callback, result)
+        if writer:
+            # 清掉舊的變更紀錄, 並依這次的查詢狀況更新統計資料 (很便宜, 只有需要時才會重新 ANALYZE)
+            try:
+                prune_change_log(conn)
+                conn.execute("PRAGMA optimize")
+            except sqlite3.OperationalError:
+                pass # 其他程式正在寫入, 下次再做
+        conn.close()
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback, args = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    callback(*args)
+                except tk.TclError:
+                    if not widget_destroyed(callback):
+                        self.root.report_callback_exception(*sys.exc_info())
+                    # 否則是等待結果時元件已被關閉, 忽略
+                except Exception:
+                    # 交給 Tk 的錯誤處理 (預設印出 traceback), 其他結果照常處理
+                    self.root.report_callback_exception(*sys.exc_info())
+        finally:
+            # 不論發生什麼事都要繼續輪詢, 否則之後的結果都會卡在佇列裡
+            self.root.after(DB_POLL_MS, self._poll)
+
+    def _show_error(self, error):
+        messagebox.showerror("Database Error", str(error))
+
+def widget_destroyed(callback):
+    # 結果要交給的元件 (bound method 的 self, 或 lambda 裡用到的 self) 是否已被關閉
+    target = getattr(callback, "__self__", None)
+    if not isinstance(target, tk.Misc):
+        target = None
+        for cell in getattr(callback, "__closure__", None) or ():
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                continue
+            if isinstance(contents, tk.Misc):
+                target = contents
+                break
+    if target is None:
+        return False
+    try:
+        return not target.winfo_exists()
+    except tk.TclError:
+        return True # 整個視窗都已關閉
+
+def job_name(job):
+    # lambda 的 __qualname__ 會帶上建立它的方法, 例如 IssuesView.load_more_rows.<locals>.<lambda>
+    return getattr(job, "__qualname__", None) or repr(job)
+
+def setup_treeview_style():
+    # ttk 主題只需要設定一次 (整個程式共用)
+    style = ttk.Style()
+    style.theme_use("clam")
+    style.configure("Treeview", background="white", foreground="black", rowheight=30, font=("Arial", 11))
+    style.configure("Treeview.Heading", font=("Arial", 11, "bold"), background="#eee")
+    style.map('Treeview', background=[('selected', '#dcebf5')], foreground=[('selected', 'black')])
+
 class RootApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -22,86 +247,60 @@ class RootApp(ctk.CTk):
         self.title("MTD_Workplace - Redmine Style")
         self.geometry("1200x800")
         
-        # 初始化資料庫
+        # 初始化資料庫 (建表), 之後所有查詢都交給背景執行緒
         self.init_db()
+        self.db = DBWorker(self, DB_PATH)
         self.current_user = None 
+        # 指派對象自動完成用的使用者索引: 啟動時在背景建一次, 之後依 users 事件更新
+        self.user_index = UserIndex()
+        self.db.submit(lambda conn: UserIndex(list_usernames(conn)), self.user_index.replace)
+        self.db.subscribe("users", self.on_users_changed)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        setup_treeview_style()
 
         # 顯示登入畫面
         self.show_login_screen()
 
     def init_db(self):
-        self.conn = sqlite3.connect("redmine_lite.db")
+        # 切換成 WAL 並依 PRAGMA user_version 只執行還沒套用過的遷移, 已是最新版時只是一次版本檢查
+        self.conn = connect(DB_PATH)
         self.cursor = self.conn.cursor()
-        
-        # 1. 使用者表
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                password TEXT
-            )
-        ''')
-        
-        # 2. Issues 表 (擴充欄位以符合截圖)
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS issues (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                tracker TEXT,       -- Support / Bug
-                subject TEXT,
-                status TEXT,        -- New / In Progress...
-                priority TEXT,
-                assignee TEXT,      -- 指派給誰
-                description TEXT,
-                start_date TEXT,
-                due_date TEXT,
-                percent_done INTEGER,
-                estimated_hours REAL,
-                created_at TEXT,
-                created_by TEXT
-            )
-        ''')
-        
-        # 3. Wiki 表
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS wiki (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT UNIQUE,
-                content TEXT,
-                updated_by TEXT
-            )
-        ''')
-
-        # 自動遷移資料庫 (防止舊資料報錯)
-        columns_to_add = [
-            ("tracker", "TEXT"), ("assignee", "TEXT"), ("start_date", "TEXT"),
-            ("due_date", "TEXT"), ("percent_done", "INTEGER"), ("estimated_hours", "REAL"),
-            ("created_by", "TEXT")
-        ]
-        for col_name, col_type in columns_to_add:
-            try:
-                self.cursor.execute(f"ALTER TABLE issues ADD COLUMN {col_name} {col_type}")
-            except sqlite3.OperationalError:
-                pass 
-        
-        self.conn.commit()
+        # 上次結束後 (例如其他程式大量匯入) 累積的變更紀錄
+        prune_change_log(self.conn)
+
+    def on_users_changed(self, op, names):
+        if op == "reload":
+            self.db.submit(lambda conn: UserIndex(list_usernames(conn)), self.user_index.replace)
+            return
+        if op == "delete":
+            for name in names:
+                self.user_index.remove(name)
+        else:
+            for name in names:
+                self.user_index.add(name)
+
+    def on_close(self):
+        self.db.stop()
+        shutdown_thumbnail_pool()
+        self.destroy()
 
     def show_login_screen(self):
         for widget in self.winfo_children(): widget.destroy()
-        LoginFrame(self, self.conn)
+        LoginFrame(self, self.db)
 
     def show_main_app(self, username):
         for widget in self.winfo_children(): widget.destroy()
         self.current_user = username
-        MainApp(self, self.conn, self.current_user)
+        MainApp(self, self.db, self.current_user)
 
 # ============================
 # 1. 登入畫面 (Login)
 # ============================
 class LoginFrame(ctk.CTkFrame):
-    def __init__(self, master, db_conn):
+    def __init__(self, master, db):
         super().__init__(master)
         self.master = master
-        self.conn = db_conn
-        self.cursor = self.conn.cursor()
+        self.db = db
         self.pack(fill="both", expand=True)
         
         # 背景色
@@ -119,19 +318,31 @@ class LoginFrame(ctk.CTkFrame):
         self.entry_pass = ctk.CTkEntry(center_frame, width=280, height=40, placeholder_text="Password", show="*")
         self.entry_pass.pack(pady=10)
         
-        ctk.CTkButton(center_frame, text="Login", command=self.login, width=280, height=40, fg_color=REDMINE_BLUE, hover_color=REDMINE_LIGHT_BLUE).pack(pady=20)
+        self.login_btn = ctk.CTkButton(center_frame, text="Login", command=self.login, width=280, height=40, fg_color=REDMINE_BLUE, hover_color=REDMINE_LIGHT_BLUE)
+        self.login_btn.pack(pady=20)
         ctk.CTkButton(center_frame, text="Register", command=self.register_popup, width=280, fg_color="transparent", text_color=REDMINE_BLUE, border_width=1, border_color=REDMINE_BLUE).pack(pady=5)
 
     def login(self):
         user = self.entry_user.get()
         pwd = self.entry_pass.get()
-        hashed_pwd = hashlib.sha256(pwd.encode()).hexdigest()
-        
-        self.cursor.execute("SELECT * FROM users WHERE username=? AND password=?", (user, hashed_pwd))
-        if self.cursor.fetchone():
-            self.master.show_main_app(user)
-        else:
-            messagebox.showerror("Error", "Invalid username or password")
+
+        def done(ok):
+            if ok:
+                self.master.show_main_app(user)
+            else:
+                self.set_busy(False)
+                messagebox.showerror("Error", "Invalid username or password")
+
+        def failed(error):
+            self.set_busy(False)
+            messagebox.showerror("Database Error", str(error))
+
+        # 查詢期間顯示載入狀態, 避免重複點擊
+        self.set_busy(True)
+        self.db.submit(lambda conn: authenticate(conn, user, pwd), done, failed)
+
+    def set_busy(self, busy):
+        self.login_btn.configure(state="disabled" if busy else "normal", text="Signing in..." if busy else "Login")
 
     def register_popup(self):
         dialog = ctk.CTkToplevel(self)
@@ -149,26 +360,35 @@ class LoginFrame(ctk.CTkFrame):
             u = new_user.get()
             p = new_pass.get()
             if not u or not p: return
-            self.cursor.execute("SELECT * FROM users WHERE username=?", (u,))
-            if self.cursor.fetchone():
-                messagebox.showerror("Error", "User already exists")
-                return
-            self.cursor.execute("INSERT INTO users VALUES (?, ?)", (u, hashlib.sha256(p.encode()).hexdigest()))
-            self.conn.commit()
-            messagebox.showinfo("Success", "Account created!")
-            dialog.destroy()
+
+            def job(conn):
+                created = register_user(conn, u, p)
+                if created:
+                    self.db.notify("users", "insert", [u])
+                return created
+
+            def done(created):
+                signup_btn.configure(state="normal")
+                if not created:
+                    messagebox.showerror("Error", "User already exists")
+                    return
+                messagebox.showinfo("Success", "Account created!")
+                dialog.destroy()
+
+            signup_btn.configure(state="disabled")
+            self.db.submit_write(job, done)
             
-        ctk.CTkButton(dialog, text="Sign Up", command=save_user, fg_color=REDMINE_BLUE).pack(pady=20)
+        signup_btn = ctk.CTkButton(dialog, text="Sign Up", command=save_user, fg_color=REDMINE_BLUE)
+        signup_btn.pack(pady=20)
 
 # ============================
 # 2. 主程式畫面 (Main App)
 # ============================
 class MainApp(ctk.CTkFrame):
-    def __init__(self, master, db_conn, current_user):
+    def __init__(self, master, db, current_user):
         super().__init__(master)
         self.master = master
-        self.conn = db_conn
-        self.cursor = self.conn.cursor()
+        self.db = db
         self.current_user = current_user
         self.pack(fill="both", expand=True)
         self.configure(fg_color="#ffffff")
@@ -186,11 +406,16 @@ class MainApp(ctk.CTkFrame):
         logout_btn.pack(side="right", padx=10)
         ctk.CTkLabel(self.header, text=f"Logged in as {self.current_user}", text_color="white").pack(side="right", padx=5)
 
+        # 搜尋框 (Issues + Wiki 全文搜尋)
+        self.search_entry = ctk.CTkEntry(self.header, width=200, placeholder_text="Search")
+        self.search_entry.pack(side="right", padx=15)
+        self.search_entry.bind("<Return>", lambda e: SearchWindow(self.master, self.db, self.search_entry.get()))
+
         # --- Menu Tabs (導航列) ---
         self.menu_frame = ctk.CTkFrame(self, height=40, corner_radius=0, fg_color=REDMINE_LIGHT_BLUE)
         self.menu_frame.pack(fill="x", side="top")
         
-        self.tabs = ["Overview", "Activity", "Issues", "Wiki", "Files", "Settings"]
+        self.tabs = ["Overview", "Activity", "Issues", "Gantt", "Wiki", "Files", "Settings"]
         for tab in self.tabs:
             btn = ctk.CTkButton(self.menu_frame, text=tab, width=80, fg_color="transparent", text_color="white", corner_radius=0, hover_color=REDMINE_BLUE,
                                 command=lambda t=tab: self.switch_tab(t))
@@ -200,30 +425,72 @@ class MainApp(ctk.CTkFrame):
         self.content_area = ctk.CTkFrame(self, fg_color="transparent")
         self.content_area.pack(fill="both", expand=True, padx=20, pady=20)
         
+        # 分頁畫面快取 (依最近使用排序): 第一次進入才建立, 之後只切換顯示
+        self.views = OrderedDict()
         self.current_frame = None
         self.switch_tab("Issues") # 預設顯示 Issues
 
+    @timed("MainApp.switch_tab")
     def switch_tab(self, tab_name):
         if self.current_frame:
-            self.current_frame.destroy()
-        
+            self.current_frame.pack_forget()
+
+        view = self.views.get(tab_name)
+        if view is None:
+            view = self.build_view(tab_name)
+            self.views[tab_name] = view
+        self.views.move_to_end(tab_name)
+        self.evict_views()
+
+        self.current_frame = view
+        view.pack(fill="both", expand=True)
+        # 讓畫面自己決定要不要更新資料 (只有過期時才重新查詢)
+        if hasattr(view, "on_show"):
+            view.on_show()
+
+    @timed("MainApp.build_view")
+    def build_view(self, tab_name):
+        if tab_name == "Overview":
+            return OverviewView(self.content_area, self.db, self.current_user)
         if tab_name == "Issues":
-            self.current_frame = IssuesView(self.content_area, self.conn, self.current_user)
-        elif tab_name == "Wiki":
-            self.current_frame = WikiView(self.content_area, self.conn, self.current_user)
-        else:
-            self.current_frame = ctk.CTkLabel(self.content_area, text=f"{tab_name} Page (Under Construction)", font=("Arial", 20))
-            self.current_frame.pack(pady=50)
+            return IssuesView(self.content_area, self.db, self.current_user)
+        if tab_name == "Gantt":
+            return GanttView(self.content_area, self.db, self.current_user)
+        if tab_name == "Wiki":
+            return WikiView(self.content_area, self.db, self.current_user)
+        if tab_name == "Files":
+            return FilesView(self.content_area, self.db, self.current_user)
+        if tab_name == "Settings":
+            return SettingsView(self.content_area, self.db, self.current_user)
+        view = ctk.CTkFrame(self.content_area, fg_color="transparent")
+        ctk.CTkLabel(view, text=f"{tab_name} Page (Under Construction)", font=("Arial", 20)).pack(pady=50)
+        return view
+
+    def evict_views(self):
+        # 超過上限時關掉最久沒用的分頁 (下次進入再重新建立);
+        # 還有未儲存內容或進行中工作的分頁 (can_evict 回傳 False) 先留著, 目前的分頁也不關
+        for tab_name in list(self.views)[:-1]:
+            if len(self.views) <= MAX_CACHED_VIEWS:
+                break
+            view = self.views[tab_name]
+            if hasattr(view, "can_evict") and not view.can_evict():
+                continue
+            del self.views[tab_name]
+            view.destroy()
 
 # ============================
 # 3. Issues 列表視圖
 # ============================
+# 到期篩選 (顯示名稱 -> issue_filter_clause 的 due 值)
+DUE_FILTERS = {"All": None, "Overdue": "overdue", "This week": "this_week"}
+BULK_FILE_TYPES = [("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("All files", "*.*")]
+
 class IssuesView(ctk.CTkFrame):
-    def __init__(self, master, conn, current_user):
+    def __init__(self, master, db, current_user):
         super().__init__(master, fg_color="transparent")
-        self.conn = conn
+        self.db = db
         self.current_user = current_user
-        self.pack(fill="both", expand=True)
+        self.transfers = 0 # 進行中的匯入 / 匯出
         
         # 標題列
         top_bar = ctk.CTkFrame(self, fg_color="transparent")
@@ -232,32 +499,67 @@ class IssuesView(ctk.CTkFrame):
         
         # 綠色 New Issue 按鈕
         ctk.CTkButton(top_bar, text="➕ New issue", fg_color="#4CAF50", width=100, command=self.open_new_issue_window).pack(side="right")
+        # 匯入 / 匯出 (CSV, JSONL)
+        ctk.CTkButton(top_bar, text="Export", width=70, fg_color="transparent", text_color="#555", border_width=1, border_color="#ccc", command=self.export_file).pack(side="right", padx=5)
+        ctk.CTkButton(top_bar, text="Import", width=70, fg_color="transparent", text_color="#555", border_width=1, border_color="#ccc", command=self.import_file).pack(side="right", padx=5)
+        # 多選 (Shift / Ctrl 點選, Ctrl+A 全選已載入的列) 後一次修改
+        ctk.CTkButton(top_bar, text="Bulk edit", width=80, fg_color="transparent", text_color="#555", border_width=1, border_color="#ccc", command=self.open_bulk_edit).pack(side="right", padx=5)
 
-        # 篩選器 (裝飾用)
+        # 篩選器 (交給資料庫用索引篩選)
         filter_frame = ctk.CTkFrame(self, fg_color="#f5f5f5", border_width=1, border_color="#ddd")
         filter_frame.pack(fill="x", pady=5)
-        ctk.CTkLabel(filter_frame, text="☑ Status: open", text_color="black").pack(side="left", padx=10, pady=5)
+        ctk.CTkLabel(filter_frame, text="Status", text_color="black").pack(side="left", padx=(10, 2), pady=5)
+        self.status_filter = ctk.CTkComboBox(filter_frame, width=110, values=["All", "open", "New", "In Progress", "Resolved", "Closed"], command=lambda _: self.apply_filters())
+        self.status_filter.set("open")
+        self.status_filter.pack(side="left", padx=2)
+        ctk.CTkLabel(filter_frame, text="Tracker", text_color="black").pack(side="left", padx=(10, 2))
+        self.tracker_filter = ctk.CTkComboBox(filter_frame, width=100, values=["All", "Support", "Bug", "Feature"], command=lambda _: self.apply_filters())
+        self.tracker_filter.set("All")
+        self.tracker_filter.pack(side="left", padx=2)
+        ctk.CTkLabel(filter_frame, text="Priority", text_color="black").pack(side="left", padx=(10, 2))
+        self.priority_filter = ctk.CTkComboBox(filter_frame, width=100, values=["All", "Normal", "High", "Urgent"], command=lambda _: self.apply_filters())
+        self.priority_filter.set("All")
+        self.priority_filter.pack(side="left", padx=2)
+        ctk.CTkLabel(filter_frame, text="Assignee", text_color="black").pack(side="left", padx=(10, 2))
+        # 空白代表全部
+        self.assignee_filter = AssigneePicker(filter_frame, self.winfo_toplevel().user_index, width=120,
+                                              placeholder_text="All", command=lambda _: self.apply_filters())
+        self.assignee_filter.pack(side="left", padx=2)
+        ctk.CTkLabel(filter_frame, text="Due", text_color="black").pack(side="left", padx=(10, 2))
+        self.due_filter = ctk.CTkComboBox(filter_frame, width=100, values=list(DUE_FILTERS), command=lambda _: self.apply_filters())
+        self.due_filter.set("All")
+        self.due_filter.pack(side="left", padx=2)
+        ctk.CTkLabel(filter_frame, text="Created", text_color="black").pack(side="left", padx=(10, 2))
+        self.created_from_entry = ctk.CTkEntry(filter_frame, width=95, placeholder_text="YYYY-MM-DD")
+        self.created_from_entry.pack(side="left", padx=2)
+        ctk.CTkLabel(filter_frame, text="~", text_color="black").pack(side="left")
+        self.created_to_entry = ctk.CTkEntry(filter_frame, width=95, placeholder_text="YYYY-MM-DD")
+        self.created_to_entry.pack(side="left", padx=2)
+        ctk.CTkButton(filter_frame, text="Apply", width=60, fg_color=REDMINE_BLUE, command=self.apply_filters).pack(side="left", padx=(10, 2))
+        ctk.CTkButton(filter_frame, text="Clear", width=60, fg_color="transparent", text_color="#333", border_width=1, border_color="#ccc", command=self.clear_filters).pack(side="left", padx=2)
+        # 載入狀態提示
+        self.status_label = ctk.CTkLabel(filter_frame, text="", text_color="gray")
+        self.status_label.pack(side="right", padx=10)
 
         # --- Treeview 表格 ---
         # 定義欄位符合截圖
-        self.columns = ("ID", "Tracker", "Status", "Subject", "Assignee", "% Done", "Created")
-        
-        style = ttk.Style()
-        style.theme_use("clam")
-        style.configure("Treeview", background="white", foreground="black", rowheight=30, font=("Arial", 11))
-        style.configure("Treeview.Heading", font=("Arial", 11, "bold"), background="#eee")
-        style.map('Treeview', background=[('selected', '#dcebf5')], foreground=[('selected', 'black')])
+        self.columns = tuple(ISSUE_LIST_COLUMNS)
+
 
-        self.tree = ttk.Treeview(self, columns=self.columns, show="headings", height=20)
+        table_frame = ctk.CTkFrame(self, fg_color="transparent")
+        table_frame.pack(fill="both", expand=True)
+
+        self.tree = ttk.Treeview(table_frame, columns=self.columns, show="headings", height=20, selectmode="extended")
+        self.tree.bind("<Control-a>", lambda e: self.tree.selection_set(self.tree.get_children()))
+        self.scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        # 捲動時檢查是否需要載入下一頁
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
         
-        # 設定標題
-        self.tree.heading("ID", text="#")
-        self.tree.heading("Tracker", text="Tracker")
-        self.tree.heading("Status", text="Status")
-        self.tree.heading("Subject", text="Subject")
-        self.tree.heading("Assignee", text="Assignee")
-        self.tree.heading("% Done", text="% Done")
-        self.tree.heading("Created", text="Created")
+        # 設定標題 (點擊標題可排序)
+        self.headings = {"ID": "#", "Tracker": "Tracker", "Status": "Status", "Subject": "Subject",
+                         "Assignee": "Assignee", "% Done": "% Done", "Created": "Created"}
+        for col, text in self.headings.items():
+            self.tree.heading(col, text=text, command=lambda c=col: self.sort_by(c))
         
         # 設定寬度
         self.tree.column("ID", width=50, anchor="center")
@@ -268,32 +570,454 @@ class IssuesView(ctk.CTkFrame):
         self.tree.column("% Done", width=100)
         self.tree.column("Created", width=120)
 
-        self.tree.pack(fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        # 目前的篩選與排序
+        self.filters = {"status": "open"}
+        self.sort_column = "id"
+        self.sort_desc = True
+
+        # Keyset 分頁狀態: after 是目前這一段最後一筆的 (排序值, id), 下一頁從它之後開始取
+        self.phase_index = 0
+        self.after_key = None
+        self.last_key = None
+        self.row_keys = {}
+        self.has_more = True
+        self.loading = False
+        # 上方被丟掉的範圍: before_phase 為往回取的段 (None 代表上面沒有了), before_key 為往回取的起點
+        # (None 代表從該段的最後面開始), first_key 為目前第一列的 key (比它前面的列都不在畫面上)
+        self.before_phase = None
+        self.before_key = None
+        self.first_key = None
+        # 每次 refresh 換一個世代, 丟掉舊查詢晚到的結果
+        self.generation = 0
+        self.refresh_data()
+        # 只修補有變更的列, 不必整個重新載入
+        self.db.subscribe("issues", self.on_issues_changed)
+
+    def can_evict(self):
+        # 匯入 / 匯出完成時要更新這個畫面
+        return self.transfers == 0
+
+    def destroy(self):
+        self.db.unsubscribe("issues", self.on_issues_changed)
+        super().destroy()
+
+    def read_filters(self):
+        filters = {}
+        for key, widget in (("status", self.status_filter), ("tracker", self.tracker_filter),
+                            ("priority", self.priority_filter), ("assignee", self.assignee_filter)):
+            value = widget.get()
+            filters[key] = None if value in ("All", "") else value
+        filters["due"] = DUE_FILTERS.get(self.due_filter.get())
+        # 日期區間: 起日含當天, 迄日換成隔天 00:00 當作不含的上界
+        for key, widget in (("created_from", self.created_from_entry), ("created_to", self.created_to_entry)):
+            text = widget.get().strip()
+            if not text:
+                filters[key] = None
+                continue
+            try:
+                day = datetime.strptime(text, "%Y-%m-%d")
+            except ValueError:
+                messagebox.showwarning("Warning", f"Invalid date: {text} (use YYYY-MM-DD)")
+                return None
+            if key == "created_to":
+                day += timedelta(days=1)
+            filters[key] = day.strftime("%Y-%m-%d")
+        return filters
+
+    def apply_filters(self):
+        filters = self.read_filters()
+        if filters is None:
+            return
+        self.filters = filters
+        self.refresh_data()
+
+    def clear_filters(self):
+        for widget in (self.status_filter, self.tracker_filter, self.priority_filter, self.due_filter):
+            widget.set("All")
+        self.assignee_filter.set("")
+        for widget in (self.created_from_entry, self.created_to_entry):
+            widget.delete(0, "end")
+        self.apply_filters()
+
+    def sort_by(self, col):
+        column = ISSUE_LIST_COLUMNS[col]
+        # 同一欄再點一次就反向
+        if column == self.sort_column:
+            self.sort_desc = not self.sort_desc
+        else:
+            self.sort_column = column
+            self.sort_desc = column in ("id", "created_at", "percent_done")
+        for c, text in self.headings.items():
+            arrow = (" ▼" if self.sort_desc else " ▲") if c == col else ""
+            self.tree.heading(c, text=text + arrow)
         self.refresh_data()
 
+    @timed("IssuesView.refresh_data")
     def refresh_data(self):
-        for i in self.tree.get_children(): self.tree.delete(i)
-        cur = self.conn.cursor()
-        cur.execute("SELECT id, tracker, status, subject, assignee, percent_done, created_at FROM issues ORDER BY id DESC")
-        for row in cur.fetchall():
-            # 加上 % 符號
-            percent = f"{row[5]}%" if row[5] is not None else "0%"
-            # 插入資料
-            self.tree.insert("", "end", values=(row[0], row[1], row[2], row[3], row[4], percent, row[6]))
+        # 清空後只重新載入第一頁, 其餘等捲動時再取
+        self.tree.delete(*self.tree.get_children())
+        self.generation += 1
+        self.phase_index = 0
+        self.after_key = None
+        self.last_key = None
+        self.row_keys = {}
+        self.has_more = True
+        self.loading = False
+        self.before_phase = None
+        self.before_key = None
+        self.first_key = None
+        self.load_more_rows()
+
+    def load_more_rows(self):
+        if self.loading or not self.has_more:
+            return
+        self.loading = True
+        self.status_label.configure(text="Loading...")
+        phase = issue_sort_phases(self.sort_column, self.sort_desc)[self.phase_index]
+        filters, sort_column, sort_desc, after_key = self.filters, self.sort_column, self.sort_desc, self.after_key
+        generation = self.generation
+        self.db.submit(lambda conn: list_issues(conn, filters, sort_column, sort_desc, phase, after_key),
+                       lambda rows: self.on_rows_loaded(generation, rows), self.on_load_failed)
+
+    @timed("IssuesView.on_rows_loaded")
+    def on_rows_loaded(self, generation, rows):
+        if generation != self.generation:
+            return
+        for row in rows:
+            # 以 issue id 當作 Treeview 的 iid, 之後可直接定位該列
+            iid = str(row[0])
+            if iid in self.row_keys:
+                continue # 載入期間修補進來的列
+            self.tree.insert("", "end", iid=iid, values=self.format_row(row))
+            self.row_keys[iid] = self.sort_key(row)
+        if rows:
+            self.after_key = self.last_key = self.sort_key(rows[-1])
+            self.trim_rows(from_top=True)
+        self.loading = False
+        self.status_label.configure(text="")
+        if len(rows) < ISSUE_PAGE_SIZE:
+            # 這一段取完了, 換下一段 (例如排序欄位為 NULL 的列) 並立刻補滿這一頁
+            self.phase_index += 1
+            self.after_key = None
+            self.has_more = self.phase_index < len(issue_sort_phases(self.sort_column, self.sort_desc))
+            self.load_more_rows()
+
+    def load_previous_rows(self):
+        # 往上捲回被丟掉的範圍: 用相反的排序方向從 before_key 往回取一頁
+        if self.loading or self.before_phase is None:
+            return
+        self.loading = True
+        self.status_label.configure(text="Loading...")
+        phase = issue_sort_phases(self.sort_column, self.sort_desc)[self.before_phase]
+        filters, sort_column, reverse, before_key = self.filters, self.sort_column, not self.sort_desc, self.before_key
+        generation = self.generation
+        self.db.submit(lambda conn: list_issues(conn, filters, sort_column, reverse, phase, before_key),
+                       lambda rows: self.on_previous_rows_loaded(generation, rows), self.on_load_failed)
+
+    @timed("IssuesView.on_previous_rows_loaded")
+    def on_previous_rows_loaded(self, generation, rows):
+        if generation != self.generation:
+            return
+        with self.keep_view():
+            # rows 由近到遠, 逐一插到最上面後順序就正確了
+            for row in rows:
+                iid = str(row[0])
+                if iid in self.row_keys:
+                    continue # 載入期間修補進來的列
+                self.tree.insert("", 0, iid=iid, values=self.format_row(row))
+                self.row_keys[iid] = self.sort_key(row)
+            if rows:
+                self.before_key = self.first_key = self.sort_key(rows[-1])
+            self.trim_rows(from_top=False)
+        self.loading = False
+        self.status_label.configure(text="")
+        if len(rows) < ISSUE_PAGE_SIZE:
+            # 這一段往回取完了, 換前一段 (從最後面開始)
+            self.before_phase = self.before_phase - 1 if self.before_phase > 0 else None
+            self.before_key = None
+            self.load_previous_rows()
+
+    def phase_of(self, key):
+        # 依排序值判斷這一列屬於哪一段 (排序欄位為 NULL 的列在 "null" 段)
+        phases = issue_sort_phases(self.sort_column, self.sort_desc)
+        return phases.index("null" if self.sort_column != "id" and key[0] is None else "value")
+
+    def trim_rows(self, from_top):
+        # 超過 ISSUE_WINDOW_ROWS 時丟掉一端的列 (記憶體與修補成本不隨捲動深度增加), 並記下重新查詢的起點
+        children = self.tree.get_children()
+        excess = len(children) - ISSUE_WINDOW_ROWS
+        if excess <= 0:
+            return
+        dropped = children[:excess] if from_top else children[-excess:]
+        kept = children[excess] if from_top else children[-excess - 1]
+        with self.keep_view():
+            self.tree.delete(*dropped)
+            for iid in dropped:
+                del self.row_keys[iid]
+        key = self.row_keys[kept]
+        if from_top:
+            self.before_phase, self.before_key, self.first_key = self.phase_of(key), key, key
+        else:
+            self.phase_index, self.after_key, self.last_key = self.phase_of(key), key, key
+            self.has_more = True
+
+    @contextmanager
+    def keep_view(self):
+        # 在可見範圍以外增刪列時, 讓原本最上面看得到的列留在原位 (Treeview 記的是第一列的索引)
+        children = self.tree.get_children()
+        top = children[min(len(children) - 1, int(float(self.tree.yview()[0]) * len(children)))] if children else None
+        yield
+        if top is not None and self.tree.exists(top):
+            self.tree.yview_moveto(self.tree.index(top) / max(1, len(self.tree.get_children())))
+
+    def on_load_failed(self, error):
+        self.loading = False
+        self.status_label.configure(text="Load failed")
+        messagebox.showerror("Database Error", str(error))
+
+    def sort_key(self, row):
+        return (row[list(ISSUE_LIST_COLUMNS.values()).index(self.sort_column)], row[0])
+
+    def comes_before(self, a, b):
+        # a, b 為 (排序值, id); 判斷 a 是否排在 b 前面, 規則與 repository.build_issue_query 相同
+        (va, ia), (vb, ib) = a, b
+        if (va is None) != (vb is None):
+            return (vb is None) if self.sort_desc else (va is None)
+        if va == vb:
+            return ia > ib if self.sort_desc else ia < ib
+        return va > vb if self.sort_desc else va < vb
+
+    def format_row(self, row):
+        # 加上 % 符號
+        percent = f"{row[5]}%" if row[5] is not None else "0%"
+        return (row[0], row[1], row[2], row[3], row[4], percent, row[6])
+
+    def on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.loading:
+            return
+        # 計算可見範圍下方 / 上方還剩幾列, 不夠就預先載入下一頁 / 上一頁
+        if self.has_more and len(self.row_keys) * (1.0 - float(last)) < ISSUE_PREFETCH_ROWS:
+            self.after_idle(self.load_more_rows)
+        elif self.before_phase is not None and len(self.row_keys) * float(first) < ISSUE_PREFETCH_ROWS:
+            self.after_idle(self.load_previous_rows)
+
+    def on_issues_changed(self, op, ids):
+        if op == "reload":
+            self.refresh_data()
+            return
+        # 修改的都是已載入的列 (例如批次編輯) 時只修補這些列, 數量再多也一樣
+        loaded = op == "update" and all(str(issue_id) in self.row_keys for issue_id in ids)
+        if len(ids) > ISSUE_PAGE_SIZE and not loaded:
+            # 大量變更 (例如別台電腦匯入) 時, 重新載入第一頁比逐列修補便宜
+            self.refresh_data()
+            return
+        if op == "delete":
+            for issue_id in ids:
+                self.remove_row(str(issue_id))
+            return
+        filters, generation = self.filters, self.generation
+        # 用目前的篩選條件再查一次這些 id: 查得到的放進列表, 查不到的代表已不符合
+        self.db.submit(lambda conn: get_issues(conn, ids, filters), lambda rows: self.patch_rows(generation, ids, rows))
+
+    @timed("IssuesView.patch_rows")
+    def patch_rows(self, generation, ids, rows):
+        if generation != self.generation:
+            return # 查詢期間換了篩選或排序, 結果是依舊條件查的; 新列表的第一頁本來就會包含這些變更
+        matched = {str(row[0]) for row in rows}
+        for issue_id in ids:
+            if str(issue_id) not in matched:
+                self.remove_row(str(issue_id))
+        for row in rows:
+            iid = str(row[0])
+            key = self.sort_key(row)
+            if self.row_keys.get(iid) == key:
+                self.tree.item(iid, values=self.format_row(row))
+                continue
+            # 排序值變了就移到新位置
+            self.remove_row(iid)
+            if self.has_more and self.last_key is not None and not self.comes_before(key, self.last_key):
+                continue # 還沒載入到的範圍, 捲動到那裡時自然會取得
+            if self.before_phase is not None and self.first_key is not None and self.comes_before(key, self.first_key):
+                continue # 已經從上方丟掉的範圍, 捲回去時會重新查詢
+            self.tree.insert("", self.find_insert_index(key), iid=iid, values=self.format_row(row))
+            self.row_keys[iid] = key
+
+    def remove_row(self, iid):
+        if iid in self.row_keys:
+            self.tree.delete(iid)
+            del self.row_keys[iid]
+
+    def find_insert_index(self, key):
+        # 已載入的列依排序排好, 二分搜尋插入位置 (預設依 id 遞減時新 issue 都排第一, 很快就結束)
+        children = self.tree.get_children()
+        low, high = 0, len(children)
+        while low < high:
+            middle = (low + high) // 2
+            if self.comes_before(key, self.row_keys[children[middle]]):
+                high = middle
+            else:
+                low = middle + 1
+        return low if low < len(children) else "end"
+
+    def open_bulk_edit(self):
+        ids = [int(iid) for iid in self.tree.selection()]
+        if not ids:
+            messagebox.showinfo("Bulk edit", "Select one or more issues first (Shift / Ctrl + click, Ctrl+A).")
+            return
+        # 列表只留著捲動範圍內的列 (ISSUE_WINDOW_ROWS): 全選時問要不要改全部符合目前篩選的 issue
+        partial = self.has_more or self.before_phase is not None
+        if partial and len(ids) == len(self.row_keys):
+            answer = messagebox.askyesnocancel(
+                "Bulk edit", f"Only {len(ids)} issues are loaded.\n\n"
+                             "Yes: edit every issue matching the current filter\nNo: edit the loaded issues only", parent=self)
+            if answer is None:
+                return
+            if answer:
+                BulkEditWindow(self, self.db, ids, self.status_label, filters=dict(self.filters))
+                return
+        BulkEditWindow(self, self.db, ids, self.status_label)
 
     def open_new_issue_window(self):
         # 開啟彈出視窗
-        NewIssueWindow(self.master, self.conn, self.current_user, callback=self.refresh_data)
+        NewIssueWindow(self.master, self.db, self.current_user)
+
+    def import_file(self):
+        path = filedialog.askopenfilename(title="Import issues", filetypes=BULK_FILE_TYPES)
+        if not path:
+            return
+        self.status_label.configure(text="Importing...")
+        progress = lambda n: self.db.post(lambda: self.status_label.configure(text=f"Imported {n} rows..."))
+        self.transfers += 1
+
+        def done(count):
+            self.transfers -= 1
+            self.status_label.configure(text="")
+            self.refresh_data()
+            messagebox.showinfo("Import", f"Imported {count} issues.")
+
+        def failed(error):
+            self.transfers -= 1
+            self.status_label.configure(text="")
+            self.refresh_data()
+            messagebox.showerror("Import Error", f"{error}\n\nFix the file and import it again to resume.")
+
+        self.db.submit_write(lambda conn: import_issues(conn, path, progress), done, failed)
+
+    def export_file(self):
+        path = filedialog.asksaveasfilename(title="Export issues", defaultextension=".csv", filetypes=BULK_FILE_TYPES)
+        if not path:
+            return
+        self.status_label.configure(text="Exporting...")
+        progress = lambda n: self.db.post(lambda: self.status_label.configure(text=f"Exported {n} rows..."))
+        self.transfers += 1
+
+        def done(count):
+            self.transfers -= 1
+            self.status_label.configure(text="")
+            messagebox.showinfo("Export", f"Exported {count} issues.")
+
+        def failed(error):
+            self.transfers -= 1
+            self.status_label.configure(text="")
+            messagebox.showerror("Export Error", str(error))
+
+        self.db.submit_background(lambda conn: export_issues(conn, path, progress), done, failed)
 
 # ============================
 # 4. 新增 Issue 彈出視窗 (重點修改)
 # ============================
+class AssigneePicker(ctk.CTkFrame):
+    """可輸入的使用者欄位: 每次按鍵只在記憶體的 UserIndex 做前綴查詢, 不查資料庫。
+
+    ↑↓ 選擇、Enter 確定、Esc 關閉; 選定後呼叫 command(name)。
+    """
+    NAVIGATION_KEYS = ("Up", "Down", "Return", "Escape", "Tab")
+
+    def __init__(self, master, user_index, width=140, placeholder_text="", command=None):
+        super().__init__(master, fg_color="transparent")
+        self.user_index = user_index
+        self.command = command
+        self.popup = None
+        self.listbox = None
+        self.entry = ctk.CTkEntry(self, width=width, placeholder_text=placeholder_text)
+        self.entry.pack(fill="x")
+        self.entry.bind("<KeyRelease>", self.on_key)
+        self.entry.bind("<Down>", lambda e: self.move_selection(1))
+        self.entry.bind("<Up>", lambda e: self.move_selection(-1))
+        self.entry.bind("<Return>", lambda e: self.accept())
+        self.entry.bind("<Escape>", lambda e: self.hide_matches())
+        # 點選清單時輸入框會先失去焦點, 稍等一下再關
+        self.entry.bind("<FocusOut>", lambda e: self.after(150, self.hide_matches))
+
+    def get(self):
+        return self.entry.get().strip()
+
+    def set(self, value):
+        self.entry.delete(0, "end")
+        if value:
+            self.entry.insert(0, value)
+
+    def destroy(self):
+        self.hide_matches()
+        super().destroy()
+
+    def on_key(self, event):
+        if event.keysym in self.NAVIGATION_KEYS:
+            return
+        text = self.get()
+        matches = self.user_index.prefix(text) if text else []
+        if matches:
+            self.show_matches(matches)
+        else:
+            self.hide_matches()
+
+    def show_matches(self, matches):
+        if self.popup is None:
+            self.popup = tk.Toplevel(self)
+            self.popup.overrideredirect(True)
+            self.listbox = tk.Listbox(self.popup, font=("Arial", 11), activestyle="none", exportselection=False,
+                                      selectbackground="#dcebf5", selectforeground="black")
+            self.listbox.pack(fill="both", expand=True)
+            self.listbox.bind("<ButtonRelease-1>", lambda e: self.accept())
+        self.listbox.delete(0, "end")
+        for name in matches:
+            self.listbox.insert("end", name)
+        self.listbox.configure(height=len(matches))
+        self.listbox.selection_set(0)
+        self.popup.geometry(f"{self.entry.winfo_width()}x{self.listbox.winfo_reqheight()}"
+                            f"+{self.entry.winfo_rootx()}+{self.entry.winfo_rooty() + self.entry.winfo_height()}")
+        self.popup.lift()
+
+    def hide_matches(self):
+        if self.popup is not None:
+            self.popup.destroy()
+            self.popup = self.listbox = None
+
+    def move_selection(self, step):
+        if self.listbox is None:
+            return
+        current = self.listbox.curselection()
+        index = max(0, min(self.listbox.size() - 1, (current[0] if current else -1) + step))
+        self.listbox.selection_clear(0, "end")
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+
+    def accept(self):
+        if self.listbox is not None and self.listbox.curselection():
+            self.set(self.listbox.get(self.listbox.curselection()[0]))
+        self.hide_matches()
+        if self.command:
+            self.command(self.get())
+
 class NewIssueWindow(ctk.CTkToplevel):
-    def __init__(self, master, conn, current_user, callback):
+    def __init__(self, master, db, current_user):
         super().__init__(master)
-        self.conn = conn
+        self.db = db
         self.current_user = current_user
-        self.callback = callback
         
         self.title("New issue - MTD_Workplace")
         self.geometry("900x750")
@@ -348,9 +1072,9 @@ class NewIssueWindow(ctk.CTkToplevel):
         
         # Assignee
         ctk.CTkLabel(form_frame, text="Assignee", text_color="#333").grid(row=5, column=0, sticky="e", padx=10, pady=5)
-        # 這裡撈取所有使用者
-        users = [u[0] for u in self.conn.cursor().execute("SELECT username FROM users").fetchall()]
-        self.assignee_cb = ctk.CTkComboBox(form_frame, values=users)
+        # 輸入時從共用的使用者索引找前綴相符的名稱, 開視窗不必再查資料庫
+        self.user_index = master.winfo_toplevel().user_index
+        self.assignee_cb = AssigneePicker(form_frame, self.user_index)
         self.assignee_cb.set(self.current_user) # 預設自己
         self.assignee_cb.grid(row=5, column=1, sticky="w", padx=10)
         
@@ -367,8 +1091,10 @@ class NewIssueWindow(ctk.CTkToplevel):
         # 底部按鈕
         btn_frame = ctk.CTkFrame(self, fg_color="transparent")
         btn_frame.pack(pady=20)
-        ctk.CTkButton(btn_frame, text="Create", command=self.save_issue, fg_color=REDMINE_BLUE).pack(side="left", padx=10)
-        ctk.CTkButton(btn_frame, text="Create and continue", command=lambda: self.save_issue(close=False), fg_color="transparent", border_width=1, border_color="#ccc", text_color="#333").pack(side="left", padx=10)
+        self.create_btn = ctk.CTkButton(btn_frame, text="Create", command=self.save_issue, fg_color=REDMINE_BLUE)
+        self.create_btn.pack(side="left", padx=10)
+        self.continue_btn = ctk.CTkButton(btn_frame, text="Create and continue", command=lambda: self.save_issue(close=False), fg_color="transparent", border_width=1, border_color="#ccc", text_color="#333")
+        self.continue_btn.pack(side="left", padx=10)
 
     def save_issue(self, close=True):
         tracker = self.tracker_cb.get()
@@ -376,55 +1102,173 @@ class NewIssueWindow(ctk.CTkToplevel):
         if not subject:
             messagebox.showwarning("Warning", "Subject cannot be empty")
             return
+        assignee = self.assignee_cb.get()
+        if assignee and self.user_index.loaded and assignee not in self.user_index:
+            messagebox.showwarning("Warning", f"Unknown assignee: {assignee}")
+            return
+        # 日期存成 YYYY-MM-DD, 格式錯誤在這裡就擋下
+        try:
+            start_date = normalize_date(self.start_date_entry.get())
+            due_date = normalize_date(self.due_date_entry.get())
+        except ValueError as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+        if start_date and due_date and start_date > due_date:
+            messagebox.showwarning("Warning", "Start date must not be after due date")
+            return
             
-        data = (
-            tracker,
-            subject,
-            self.status_cb.get(),
-            self.priority_cb.get(),
-            self.assignee_cb.get(),
-            self.desc_text.get("0.0", "end"),
-            self.start_date_entry.get(),
-            self.due_date_entry.get(),
-            int(self.percent_cb.get()),
-            self.hours_entry.get() or 0,
-            datetime.now().strftime("%Y-%m-%d %H:%M"),
-            self.current_user
-        )
-        
-        self.conn.cursor().execute('''
-            INSERT INTO issues (tracker, subject, status, priority, assignee, description, 
-            start_date, due_date, percent_done, estimated_hours, created_at, created_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', data)
-        self.conn.commit()
-        
-        # 通知主視窗更新
-        self.callback()
-        
-        if close:
+        data = {
+            "tracker": tracker,
+            "subject": subject,
+            "status": self.status_cb.get(),
+            "priority": self.priority_cb.get(),
+            "assignee": assignee or None,
+            "description": self.desc_text.get("0.0", "end"),
+            "start_date": start_date,
+            "due_date": due_date,
+            "percent_done": int(self.percent_cb.get()),
+            "estimated_hours": self.hours_entry.get() or 0,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "created_by": self.current_user,
+        }
+        
+        def job(conn):
+            issue_id = create_issue(conn, data)
+            # 通知列表只新增這一列
+            self.db.notify("issues", "insert", [issue_id])
+
+        def done(_):
+            if close:
+                self.destroy()
+            else:
+                self.set_busy(False)
+                # 清空欄位繼續新增
+                self.subject_entry.delete(0, "end")
+                self.desc_text.delete("0.0", "end")
+                messagebox.showinfo("Created", "Issue created successfully.")
+
+        def failed(error):
+            self.set_busy(False)
+            messagebox.showerror("Database Error", str(error))
+
+        self.set_busy(True)
+        self.db.submit_write(job, done, failed)
+
+    def set_busy(self, busy):
+        state = "disabled" if busy else "normal"
+        self.create_btn.configure(state=state, text="Saving..." if busy else "Create")
+        self.continue_btn.configure(state=state)
+
+NO_CHANGE = "(no change)"
+
+class BulkEditWindow(ctk.CTkToplevel):
+    """一次修改多個 issue 的 Status / Assignee / Priority / % Done (單一交易)。
+
+    有 filters 時改的是所有符合篩選條件的 issue, 不只 ids (已載入的列)。
+    """
+    def __init__(self, master, db, ids, status_label, filters=None):
+        super().__init__(master)
+        self.db = db
+        self.ids = ids
+        self.filters = filters
+        self.status_label = status_label
+        target = "all matching issues" if filters is not None else f"{len(ids)} issues"
+        self.title(f"Bulk edit {target} - MTD_Workplace")
+        self.geometry("420x330")
+        self.configure(fg_color="#f8f8f8")
+        self.transient(master)
+
+        heading = "Edit all issues matching the filter" if filters is not None else f"Edit {len(ids)} selected issues"
+        ctk.CTkLabel(self, text=heading, font=("Arial", 18, "bold"), text_color="#333").pack(anchor="w", padx=20, pady=15)
+        form_frame = ctk.CTkFrame(self, fg_color="#fff", border_width=1, border_color="#ddd")
+        form_frame.pack(fill="both", expand=True, padx=20)
+
+        self.fields = {}
+        for row, (field, label, values) in enumerate((("status", "Status", ["New", "In Progress", "Resolved", "Closed"]),
+                                                      ("priority", "Priority", ["Normal", "High", "Urgent"]),
+                                                      ("percent_done", "% Done", ["0", "10", "20", "50", "80", "100"]))):
+            ctk.CTkLabel(form_frame, text=label, text_color="#333").grid(row=row, column=0, sticky="e", padx=10, pady=8)
+            combo = ctk.CTkComboBox(form_frame, values=[NO_CHANGE] + values)
+            combo.set(NO_CHANGE)
+            combo.grid(row=row, column=1, sticky="w", padx=10)
+            self.fields[field] = combo
+
+        # Assignee: 空白代表不修改, 勾選 Unassign 代表清空
+        ctk.CTkLabel(form_frame, text="Assignee", text_color="#333").grid(row=3, column=0, sticky="e", padx=10, pady=8)
+        self.user_index = master.winfo_toplevel().user_index
+        self.assignee_picker = AssigneePicker(form_frame, self.user_index, placeholder_text=NO_CHANGE)
+        self.assignee_picker.grid(row=3, column=1, sticky="w", padx=10)
+        self.unassign = ctk.CTkCheckBox(form_frame, text="Unassign")
+        self.unassign.grid(row=4, column=1, sticky="w", padx=10, pady=(0, 8))
+
+        self.apply_btn = ctk.CTkButton(self, text="Apply", command=self.apply, fg_color=REDMINE_BLUE)
+        self.apply_btn.pack(pady=15)
+
+    def read_changes(self):
+        changes = {field: combo.get() for field, combo in self.fields.items() if combo.get() != NO_CHANGE}
+        assignee = self.assignee_picker.get()
+        if self.unassign.get():
+            changes["assignee"] = None
+        elif assignee:
+            if self.user_index.loaded and assignee not in self.user_index:
+                messagebox.showwarning("Warning", f"Unknown assignee: {assignee}")
+                return None
+            changes["assignee"] = assignee
+        return changes
+
+    def apply(self):
+        changes = self.read_changes()
+        if changes is None:
+            return
+        if not changes:
             self.destroy()
-        else:
-            # 清空欄位繼續新增
-            self.subject_entry.delete(0, "end")
-            self.desc_text.delete("0.0", "end")
-            messagebox.showinfo("Created", "Issue created successfully.")
+            return
+        ids, filters = self.ids, self.filters
+
+        def job(conn):
+            if filters is not None:
+                updated = bulk_update_matching(conn, filters, changes)
+            else:
+                updated = bulk_update_issues(conn, ids, changes)
+            # 列表只修補有改到的列
+            if updated:
+                self.db.notify("issues", "update", updated)
+            return updated
+
+        def done(updated):
+            if filters is not None:
+                self.status_label.configure(text=f"Updated {len(updated)} matching issues")
+            else:
+                self.status_label.configure(text=f"Updated {len(updated)} of {len(ids)} issues")
+            self.destroy()
+
+        def failed(error):
+            self.apply_btn.configure(state="normal")
+            messagebox.showerror("Database Error", str(error))
+
+        self.apply_btn.configure(state="disabled")
+        self.db.submit_write(job, done, failed)
 
 # ============================
 # 5. Wiki 視圖 (閱讀模式)
 # ============================
+WIKI_DEFAULT_TITLE = "AE Tool"
 class WikiView(ctk.CTkFrame):
-    def __init__(self, master, conn, current_user):
+    def __init__(self, master, db, current_user):
         super().__init__(master, fg_color="transparent")
-        self.conn = conn
+        self.db = db
         self.current_user = current_user
-        self.pack(fill="both", expand=True)
+        self.stale = False
+        self.editing = False
+        self.page_id = None
+        self.page_title = WIKI_DEFAULT_TITLE
         
         # 頂部工具列
         top_bar = ctk.CTkFrame(self, fg_color="transparent")
         top_bar.pack(fill="x", pady=(0, 10))
         
-        ctk.CTkLabel(top_bar, text="AE Tool", font=("Arial", 24, "bold"), text_color="#333").pack(side="left")
+        self.title_label = ctk.CTkLabel(top_bar, text=self.page_title, font=("Arial", 24, "bold"), text_color="#333")
+        self.title_label.pack(side="left")
         
         # 工具按鈕 (New, Edit, Watch...)
         tools = ["New wiki page", "Edit", "Watch", "Lock", "Rename", "Delete", "History"]
@@ -434,6 +1278,11 @@ class WikiView(ctk.CTkFrame):
                                 command=lambda x=t: self.handle_tool(x))
             btn.pack(side="left", padx=2)
 
+        # 編輯模式才出現的按鈕
+        self.save_btn = ctk.CTkButton(top_bar, text="Save", width=70, fg_color=REDMINE_BLUE, command=self.save_content)
+        self.cancel_btn = ctk.CTkButton(top_bar, text="Cancel", width=70, fg_color="transparent", text_color="#333",
+                                        border_width=1, border_color="#ccc", command=self.cancel_edit)
+
         # 內容區 (Split View: 左邊內容, 右邊索引)
         split_frame = ctk.CTkFrame(self, fg_color="transparent")
         split_frame.pack(fill="both", expand=True)
@@ -452,16 +1301,44 @@ class WikiView(ctk.CTkFrame):
             ctk.CTkLabel(sidebar, text=l, text_color=REDMINE_BLUE, cursor="hand2").pack(anchor="w", padx=10, pady=2)
             
         self.load_wiki_content()
+        # 內容被改過時只標記過期, 等畫面顯示時再重新載入
+        self.db.subscribe("wiki", self.on_wiki_changed)
+
+    def can_evict(self):
+        # 編輯中的內容還沒儲存
+        return not self.editing
+
+    def destroy(self):
+        self.db.unsubscribe("wiki", self.on_wiki_changed)
+        super().destroy()
+
+    def on_wiki_changed(self, op, ids):
+        self.stale = True
+        if self.winfo_ismapped():
+            self.on_show()
+
+    def on_show(self):
+        # 編輯中不要蓋掉使用者正在打的字
+        if self.stale and not self.editing:
+            self.load_wiki_content()
 
     def load_wiki_content(self):
+        self.stale = False
         # 預設載入第一篇 Wiki，如果沒有就顯示範例
-        cur = self.conn.cursor()
-        cur.execute("SELECT content FROM wiki LIMIT 1")
-        row = cur.fetchone()
-        
         self.content_text.configure(state="normal")
+        self.content_text.delete("0.0", "end")
+        self.content_text.insert("0.0", "Loading...")
+        self.content_text.configure(state="disabled")
+        self.db.submit(get_start_page, self.show_wiki_content)
+
+    @timed("WikiView.show_wiki_content")
+    def show_wiki_content(self, row):
+        self.content_text.configure(state="normal")
+        self.content_text.delete("0.0", "end")
         if row:
-            self.content_text.insert("0.0", row[0])
+            self.page_id, self.page_title, content = row
+            self.title_label.configure(text=self.page_title)
+            self.content_text.insert("0.0", content or "")
         else:
             # 顯示類似截圖的範例文字
             example_text = """Description:
@@ -490,10 +1367,732 @@ Formal Working Flow:
     def handle_tool(self, tool_name):
         if tool_name == "Edit":
             # 切換成可編輯模式 (簡單實作)
-            self.content_text.configure(state="normal")
+            self.set_editing(True)
             self.content_text.focus()
-            messagebox.showinfo("Edit Mode", "You can now edit the text directly. (Save feature to be added)")
+        elif tool_name == "History":
+            if self.page_id is None:
+                messagebox.showinfo("History", "This page has not been saved yet.")
+                return
+            WikiHistoryWindow(self.master, self.db, self.page_id, self.page_title)
+
+    def set_editing(self, editing):
+        self.editing = editing
+        self.content_text.configure(state="normal" if editing else "disabled")
+        if editing:
+            self.save_btn.pack(side="right", padx=2)
+            self.cancel_btn.pack(side="right", padx=2)
+        else:
+            self.save_btn.pack_forget()
+            self.cancel_btn.pack_forget()
+
+    def cancel_edit(self):
+        self.set_editing(False)
+        self.load_wiki_content()
+
+    def save_content(self):
+        title = self.page_title
+        content = self.content_text.get("0.0", "end-1c")
+        author = self.current_user
+
+        def job(conn):
+            page_id, rev = save_wiki_page(conn, title, content, author)
+            self.db.notify("wiki", "update", [page_id])
+            return page_id
+
+        def done(page_id):
+            self.page_id = page_id
+            self.save_btn.configure(state="normal")
+            self.set_editing(False)
+            self.stale = False
+
+        def failed(error):
+            self.save_btn.configure(state="normal")
+            messagebox.showerror("Database Error", str(error))
+
+        self.save_btn.configure(state="disabled")
+        self.db.submit_write(job, done, failed)
+
+class WikiHistoryWindow(ctk.CTkToplevel):
+    """頁面版本列表; 選一個版本就在右邊顯示該版內容 (於背景重建)。"""
+    def __init__(self, master, db, page_id, page_title):
+        super().__init__(master)
+        self.db = db
+        self.page_id = page_id
+        self.title(f"History - {page_title}")
+        self.geometry("900x600")
+        self.configure(fg_color="#f8f8f8")
+        self.transient(master)
+
+        ctk.CTkLabel(self, text=f"{page_title} - History", font=("Arial", 22, "bold"), text_color="#333").pack(anchor="w", padx=20, pady=15)
+        body = ctk.CTkFrame(self, fg_color="transparent")
+        body.pack(fill="both", expand=True, padx=20, pady=(0, 20))
+
+        self.tree = ttk.Treeview(body, columns=("Rev", "Author", "Date", "Stored"), show="headings", selectmode="browse")
+        for col, width in (("Rev", 50), ("Author", 100), ("Date", 130), ("Stored", 90)):
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width)
+        self.tree.pack(side="left", fill="y", padx=(0, 10))
+        self.tree.bind("<<TreeviewSelect>>", lambda e: self.show_revision())
+
+        self.content_text = ctk.CTkTextbox(body, fg_color="white", text_color="#333", font=("Arial", 14))
+        self.content_text.pack(side="left", fill="both", expand=True)
+
+        self.db.submit(lambda conn: list_wiki_revisions(conn, page_id), self.show_revisions)
+
+    def show_revisions(self, rows):
+        for rev, author, created_at, kind, size in rows:
+            self.tree.insert("", "end", iid=str(rev), values=(rev, author, created_at, f"{size} B ({kind})"))
+        if rows:
+            self.tree.selection_set(str(rows[0][0]))
+
+    def show_revision(self):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        rev = int(selection[0])
+
+        def done(text):
+            # 使用者可能已經選了別的版本
+            if self.tree.selection() != selection:
+                return
+            self.content_text.configure(state="normal")
+            self.content_text.delete("0.0", "end")
+            self.content_text.insert("0.0", text)
+            self.content_text.configure(state="disabled")
+
+        self.db.submit(lambda conn: load_wiki_revision(conn, self.page_id, rev), done)
+
+# ============================
+# 6. 全文搜尋 (FTS5)
+# ============================
+SEARCH_DELAY_MS = 250      # 停止打字多久後才送出查詢
+
+class SearchWindow(ctk.CTkToplevel):
+    def __init__(self, master, db, text=""):
+        super().__init__(master)
+        self.db = db
+        self.title("Search - MTD_Workplace")
+        self.geometry("800x600")
+        self.configure(fg_color="#f8f8f8")
+        self.transient(master)
+        self.pending = None
+        self.generation = 0
+
+        ctk.CTkLabel(self, text="Search", font=("Arial", 22, "bold"), text_color="#333").pack(anchor="w", padx=20, pady=15)
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.pack(fill="x", padx=20)
+        self.entry = ctk.CTkEntry(bar, width=500, placeholder_text="Issues and wiki pages")
+        self.entry.pack(side="left")
+        self.entry.bind("<KeyRelease>", lambda e: self.schedule_search())
+        self.status_label = ctk.CTkLabel(bar, text="", text_color="gray")
+        self.status_label.pack(side="left", padx=10)
+
+        # 結果區: 用 tag 標示標題與命中字
+        self.results_text = ctk.CTkTextbox(self, fg_color="white", text_color="#333", wrap="word")
+        self.results_text.pack(fill="both", expand=True, padx=20, pady=20)
+        self.results_text.tag_config("title", foreground=REDMINE_BLUE)
+        self.results_text.tag_config("hit", background="#ffee88")
+        self.results_text.tag_config("snippet", foreground="#555")
+
+        if text:
+            self.entry.insert(0, text)
+            self.run_search()
+        self.entry.focus()
+
+    def schedule_search(self):
+        # 打字時不要每個鍵都查, 停下來一下再查
+        if self.pending:
+            self.after_cancel(self.pending)
+        self.pending = self.after(SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self.pending = None
+        text = self.entry.get().strip()
+        self.generation += 1
+        generation = self.generation
+        self.status_label.configure(text="Searching...")
+        started = datetime.now()
+
+        def done(results):
+            if generation != self.generation:
+                return
+            elapsed = (datetime.now() - started).total_seconds() * 1000
+            self.status_label.configure(text=f"{len(results)} results ({elapsed:.0f} ms)")
+            self.show_results(results)
+
+        self.db.submit(lambda conn: search_all(conn, text), done)
+
+    def show_results(self, results):
+        self.results_text.configure(state="normal")
+        self.results_text.delete("0.0", "end")
+        for kind, row_id, title, snippet in results:
+            label = f"Issue #{row_id}: " if kind == "issue" else "Wiki: "
+            self.results_text.insert("end", label, "title")
+            self.insert_marked(title or "", "title")
+            self.results_text.insert("end", "\n")
+            self.insert_marked(snippet or "", "snippet")
+            self.results_text.insert("end", "\n\n")
+        self.results_text.configure(state="disabled")
+
+    def insert_marked(self, text, tag):
+        # 把 HIT_START...HIT_END 之間的文字加上醒目標示
+        for i, part in enumerate(text.split(HIT_START)):
+            hit, _, rest = part.partition(HIT_END) if i else ("", "", part)
+            if hit:
+                self.results_text.insert("end", hit, (tag, "hit"))
+            self.results_text.insert("end", rest, tag)
+
+# ============================
+# 7. Overview 儀表板
+# ============================
+OVERVIEW_REFRESH_DELAY_MS = 500   # 連續變更時合併成一次更新
+
+class OverviewView(ctk.CTkFrame):
+    """Issue 統計。只讀 issue_stats 彙總表, 成本與分組數量有關, 與 issue 總數無關。"""
+    def __init__(self, master, db, current_user):
+        super().__init__(master, fg_color="transparent")
+        self.db = db
+        self.current_user = current_user
+        self.stale = False
+        self.pending = None
+
+        top_bar = ctk.CTkFrame(self, fg_color="transparent")
+        top_bar.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(top_bar, text="Overview", font=("Arial", 24, "bold"), text_color="#333").pack(side="left")
+        self.total_label = ctk.CTkLabel(top_bar, text="Loading...", text_color="gray")
+        self.total_label.pack(side="right", padx=10)
+
+        # 每個維度一個小表格
+        grid = ctk.CTkFrame(self, fg_color="transparent")
+        grid.pack(fill="both", expand=True)
+        self.tables = {}
+        for index, dim in enumerate(STATS_DIMENSIONS):
+            box = ctk.CTkFrame(grid, fg_color="#fcfcfc", border_width=1, border_color="#ddd")
+            box.grid(row=index // 2, column=index % 2, sticky="nsew", padx=5, pady=5)
+            ctk.CTkLabel(box, text=dim.capitalize(), font=("Arial", 14, "bold"), text_color="#333").pack(anchor="w", padx=10, pady=(5, 0))
+            tree = ttk.Treeview(box, columns=("Value", "Issues", "Hours"), show="headings", height=6)
+            tree.heading("Value", text=dim.capitalize())
+            tree.heading("Issues", text="Issues")
+            tree.heading("Hours", text="Estimated time")
+            tree.column("Issues", width=80, anchor="e")
+            tree.column("Hours", width=120, anchor="e")
+            tree.pack(fill="both", expand=True, padx=10, pady=10)
+            self.tables[dim] = tree
+        grid.columnconfigure((0, 1), weight=1)
+        grid.rowconfigure((0, 1), weight=1)
+
+        self.refresh_data()
+        self.db.subscribe("issues", self.on_issues_changed)
+
+    def destroy(self):
+        self.db.unsubscribe("issues", self.on_issues_changed)
+        super().destroy()
+
+    def on_issues_changed(self, op, ids):
+        self.stale = True
+        if self.winfo_ismapped() and not self.pending:
+            self.pending = self.after(OVERVIEW_REFRESH_DELAY_MS, self.on_show)
+
+    def on_show(self):
+        self.pending = None
+        if self.stale:
+            self.refresh_data()
+
+    @timed("OverviewView.refresh_data")
+    def refresh_data(self):
+        self.stale = False
+        self.db.submit(load_issue_stats, self.show_stats)
+
+    @timed("OverviewView.show_stats")
+    def show_stats(self, rows):
+        for tree in self.tables.values():
+            tree.delete(*tree.get_children())
+        total_count = total_hours = 0
+        for dim, value, count, hours in rows:
+            self.tables[dim].insert("", "end", values=(value or "(none)", count, f"{hours:.1f}"))
+            if dim == "status":
+                total_count += count
+                total_hours += hours
+        self.total_label.configure(text=f"{total_count} issues, {total_hours:.1f} hours estimated")
+
+# ============================
+# 8. 附件 (Files)
+# ============================
+FILE_PAGE_SIZE = 200
+INGEST_WORKERS = 2
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+class FilesView(ctk.CTkFrame):
+    def __init__(self, master, db, current_user):
+        super().__init__(master, fg_color="transparent")
+        self.db = db
+        self.current_user = current_user
+        # 複製 / 雜湊在這裡做, 不佔用 DB 執行緒
+        self.ingest_pool = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+        self.pending_uploads = 0
+        self.preview_image = None
+
+        top_bar = ctk.CTkFrame(self, fg_color="transparent")
+        top_bar.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(top_bar, text="Files", font=("Arial", 24, "bold"), text_color="#333").pack(side="left")
+        ctk.CTkButton(top_bar, text="➕ New file", fg_color="#4CAF50", width=100, command=self.upload_files).pack(side="right")
+        ctk.CTkButton(top_bar, text="Save as...", width=90, fg_color="transparent", text_color="#555", border_width=1,
+                      border_color="#ccc", command=self.save_selected).pack(side="right", padx=5)
+        self.status_label = ctk.CTkLabel(top_bar, text="", text_color="gray")
+        self.status_label.pack(side="right", padx=10)
+
+        body = ctk.CTkFrame(self, fg_color="transparent")
+        body.pack(fill="both", expand=True)
+
+        self.tree = ttk.Treeview(body, columns=("File", "Size", "Author", "Date"), show="headings")
+        for col, width in (("File", 400), ("Size", 90), ("Author", 120), ("Date", 130)):
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width)
+        self.scrollbar = ttk.Scrollbar(body, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.tree.bind("<<TreeviewSelect>>", lambda e: self.show_preview())
+
+        # 右邊預覽 (圖片顯示縮圖)
+        self.preview = ctk.CTkLabel(body, text="", width=260, fg_color="#fcfcfc")
+        self.preview.pack(side="right", fill="y", padx=(10, 0))
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        # iid -> (檔名, sha256), 與 Issues 一樣以 id 做 keyset 分頁
+        self.files = {}
+        self.generation = 0
+        self.reload()
+        self.db.subscribe("attachments", self.on_attachments_changed)
+
+    def can_evict(self):
+        # 上傳中的檔案完成時要顯示結果
+        return self.pending_uploads == 0
+
+    def destroy(self):
+        self.db.unsubscribe("attachments", self.on_attachments_changed)
+        self.ingest_pool.shutdown(wait=False)
+        super().destroy()
+
+    def reload(self):
+        # 清空後從第一頁重新載入; 換一個世代, 丟掉舊查詢晚到的結果
+        self.tree.delete(*self.tree.get_children())
+        self.files = {}
+        self.generation += 1
+        self.last_id = None
+        self.has_more = True
+        self.loading = False
+        self.load_more_rows()
+
+    def load_more_rows(self):
+        if self.loading or not self.has_more:
+            return
+        self.loading = True
+        last_id, generation = self.last_id, self.generation
+        self.db.submit(lambda conn: list_attachments(conn, last_id, FILE_PAGE_SIZE),
+                       lambda rows: self.on_rows_loaded(generation, rows))
+
+    @timed("FilesView.on_rows_loaded")
+    def on_rows_loaded(self, generation, rows):
+        if generation != self.generation:
+            return
+        for row in rows:
+            self.insert_row(row, "end")
+        if rows:
+            self.last_id = rows[-1][0]
+        self.has_more = len(rows) == FILE_PAGE_SIZE
+        self.loading = False
+
+    def insert_row(self, row, index):
+        file_id, filename, sha256, size, author, uploaded_at = row
+        if self.tree.exists(str(file_id)):
+            return
+        self.tree.insert("", index, iid=str(file_id), values=(filename, format_size(size), author, uploaded_at))
+        self.files[str(file_id)] = (filename, sha256)
+
+    def on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.has_more and not self.loading and len(self.files) * (1.0 - float(last)) < ISSUE_PREFETCH_ROWS:
+            self.after_idle(self.load_more_rows)
+
+    def on_attachments_changed(self, op, ids):
+        if op == "reload":
+            self.reload()
+            return
+        if op == "delete":
+            for file_id in ids:
+                if self.tree.exists(str(file_id)):
+                    self.tree.delete(str(file_id))
+                    self.files.pop(str(file_id), None)
+            return
+        self.db.submit(lambda conn: get_attachments(conn, ids), lambda rows: [self.insert_row(row, 0) for row in reversed(rows)])
+
+    def upload_files(self):
+        paths = filedialog.askopenfilenames(title="Upload files")
+        for path in paths:
+            self.pending_uploads += 1
+            future = self.ingest_pool.submit(store_attachment, path)
+            future.add_done_callback(lambda f, p=path: self.db.post(self.on_stored, p, f))
+        self.update_status()
+
+    def on_stored(self, path, future):
+        try:
+            sha256, size = future.result()
+        except Exception as e:
+            self.pending_uploads -= 1
+            self.update_status()
+            messagebox.showerror("Upload Error", f"{os.path.basename(path)}: {e}")
+            return
+        filename, author = os.path.basename(path), self.current_user
+
+        def job(conn):
+            file_id = add_attachment(conn, filename, sha256, size, author)
+            self.db.notify("attachments", "insert", [file_id])
+
+        def done(_):
+            self.pending_uploads -= 1
+            self.update_status()
+            # 圖片先在背景產生縮圖, 之後預覽就不必等
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                thumbnail_pool().submit(make_thumbnail, sha256)
+
+        self.db.submit_write(job, done)
+
+    def update_status(self):
+        self.status_label.configure(text=f"Uploading {self.pending_uploads} file(s)..." if self.pending_uploads else "")
+
+    def show_preview(self):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        filename, sha256 = self.files[selection[0]]
+        self.preview_image = None
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            self.preview.configure(image=None, text=filename)
+            return
+        self.preview.configure(image=None, text="Loading preview...")
+        path = thumbnail_path(sha256)
+        if os.path.exists(path):
+            self.show_thumbnail(selection, path)
+            return
+        future = thumbnail_pool().submit(make_thumbnail, sha256)
+        future.add_done_callback(lambda f: self.db.post(self.on_thumbnail_ready, selection, f))
+
+    def on_thumbnail_ready(self, selection, future):
+        try:
+            path = future.result()
+        except Exception as e:
+            self.preview.configure(image=None, text=f"No preview\n({e})")
+            return
+        self.show_thumbnail(selection, path)
+
+    def show_thumbnail(self, selection, path):
+        # 使用者可能已經選了別的檔案
+        if self.tree.selection() != selection:
+            return
+        with Image.open(path) as image:
+            image.load()
+            self.preview_image = ctk.CTkImage(light_image=image, size=image.size)
+        self.preview.configure(image=self.preview_image, text="")
+
+    def save_selected(self):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        filename, sha256 = self.files[selection[0]]
+        dst = filedialog.asksaveasfilename(title="Save file", initialfile=filename)
+        if not dst:
+            return
+        future = self.ingest_pool.submit(shutil.copyfile, attachment_path(sha256), dst)
+        future.add_done_callback(lambda f: self.db.post(self.on_saved, f))
+
+    def on_saved(self, future):
+        try:
+            future.result()
+        except Exception as e:
+            messagebox.showerror("Save Error", str(e))
+
+# ============================
+# 9. 甘特圖 (Gantt)
+# ============================
+GANTT_WINDOWS = {"4 weeks": 28, "8 weeks": 56, "13 weeks": 91, "26 weeks": 182}
+GANTT_ROW_HEIGHT = 24
+GANTT_HEADER_HEIGHT = 36
+GANTT_LABEL_WIDTH = 280
+
+class GanttView(ctk.CTkFrame):
+    """時間軸: 只查目前視窗 (幾週) 內重疊的 issues, 左右移動時才查下一段。"""
+    def __init__(self, master, db, current_user):
+        super().__init__(master, fg_color="transparent")
+        self.db = db
+        self.current_user = current_user
+        self.rows = []
+        self.generation = 0
+        self.stale = False
+        self.pending = None
+        today = date.today()
+        self.window_start = today - timedelta(days=today.weekday())
+
+        top_bar = ctk.CTkFrame(self, fg_color="transparent")
+        top_bar.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(top_bar, text="Gantt", font=("Arial", 24, "bold"), text_color="#333").pack(side="left")
+        for text, command in (("◀", lambda: self.shift(-7)), ("Today", self.go_today), ("▶", lambda: self.shift(7))):
+            ctk.CTkButton(top_bar, text=text, width=50, fg_color="transparent", text_color="#555", border_width=1,
+                          border_color="#ccc", command=command).pack(side="left", padx=(10 if text == "◀" else 2, 2))
+        self.span_cb = ctk.CTkComboBox(top_bar, width=100, values=list(GANTT_WINDOWS), command=lambda _: self.load_window())
+        self.span_cb.set("8 weeks")
+        self.span_cb.pack(side="left", padx=10)
+        self.open_only = ctk.CTkCheckBox(top_bar, text="Open issues only", command=self.load_window)
+        self.open_only.select()
+        self.open_only.pack(side="left")
+        self.status_label = ctk.CTkLabel(top_bar, text="", text_color="gray")
+        self.status_label.pack(side="right", padx=10)
+
+        body = ctk.CTkFrame(self, fg_color="transparent")
+        body.pack(fill="both", expand=True)
+        self.canvas = tk.Canvas(body, background="white", highlightthickness=0)
+        scrollbar = ttk.Scrollbar(body, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.canvas.bind("<Configure>", lambda e: self.draw())
+        self.canvas.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+
+        self.load_window()
+        self.db.subscribe("issues", self.on_issues_changed)
+
+    def destroy(self):
+        self.db.unsubscribe("issues", self.on_issues_changed)
+        super().destroy()
+
+    def on_issues_changed(self, op, ids):
+        # 跟 Overview 一樣合併連續變更, 畫面沒顯示時等切回來再查
+        self.stale = True
+        if self.winfo_ismapped() and not self.pending:
+            self.pending = self.after(OVERVIEW_REFRESH_DELAY_MS, self.on_show)
+
+    def on_show(self):
+        self.pending = None
+        if self.stale:
+            self.load_window()
+
+    @property
+    def days(self):
+        return GANTT_WINDOWS.get(self.span_cb.get(), 56)
+
+    def shift(self, days):
+        self.window_start += timedelta(days=days)
+        self.load_window()
+
+    def go_today(self):
+        today = date.today()
+        self.window_start = today - timedelta(days=today.weekday())
+        self.load_window()
+
+    @timed("GanttView.load_window")
+    def load_window(self):
+        self.stale = False
+        self.generation += 1
+        generation = self.generation
+        start = self.window_start.isoformat()
+        end = (self.window_start + timedelta(days=self.days - 1)).isoformat()
+        open_only = bool(self.open_only.get())
+        self.status_label.configure(text="Loading...")
+        self.db.submit(lambda conn: list_timeline(conn, start, end, open_only), lambda rows: self.on_rows_loaded(generation, rows))
+
+    def on_rows_loaded(self, generation, rows):
+        if generation != self.generation:
+            return  # 已經換到別的視窗
+        self.rows = rows
+        more = " (first %d)" % TIMELINE_MAX_ROWS if len(rows) >= TIMELINE_MAX_ROWS else ""
+        self.status_label.configure(text=f"{len(rows)} issues{more}")
+        self.draw()
+
+    @timed("GanttView.draw")
+    def draw(self):
+        canvas = self.canvas
+        canvas.delete("all")
+        width = max(canvas.winfo_width(), GANTT_LABEL_WIDTH + 200)
+        days = self.days
+        day_width = (width - GANTT_LABEL_WIDTH) / days
+        x_of = lambda d: GANTT_LABEL_WIDTH + (d - self.window_start).days * day_width
+        height = GANTT_HEADER_HEIGHT + len(self.rows) * GANTT_ROW_HEIGHT
+        today = date.today()
+
+        # 表頭: 每週一畫一條線與日期
+        for offset in range(days):
+            day = self.window_start + timedelta(days=offset)
+            x = x_of(day)
+            if day.weekday() >= 5:
+                canvas.create_rectangle(x, GANTT_HEADER_HEIGHT, x + day_width, height, fill="#f6f6f6", outline="")
+            if day.weekday() == 0:
+                canvas.create_line(x, 0, x, height, fill="#ddd")
+                canvas.create_text(x + 4, GANTT_HEADER_HEIGHT / 2, text=day.strftime("%m-%d"), anchor="w", fill="#555",
+                                   font=("Arial", 10, "bold"))
+        canvas.create_line(0, GANTT_HEADER_HEIGHT, width, GANTT_HEADER_HEIGHT, fill="#ccc")
+        canvas.create_line(GANTT_LABEL_WIDTH, 0, GANTT_LABEL_WIDTH, height, fill="#ccc")
+
+        last_day = self.window_start + timedelta(days=days - 1)
+        for index, (issue_id, tracker, subject, status, assignee, start, due, done) in enumerate(self.rows):
+            top = GANTT_HEADER_HEIGHT + index * GANTT_ROW_HEIGHT
+            label = f"{tracker} #{issue_id}: {subject}"
+            canvas.create_text(6, top + GANTT_ROW_HEIGHT / 2, text=label[:42], anchor="w", fill="#333",
+                               font=("Arial", 10))
+            start_day = max(date.fromisoformat(start), self.window_start)
+            due_day = min(date.fromisoformat(due), last_day)
+            x1, x2 = x_of(start_day), x_of(due_day) + day_width
+            overdue = date.fromisoformat(due) < today and status in OPEN_STATUSES
+            color = "#e0a0a0" if overdue else "#a8c5e0"
+            canvas.create_rectangle(x1, top + 6, x2, top + GANTT_ROW_HEIGHT - 6, fill=color, outline="")
+            if done:
+                canvas.create_rectangle(x1, top + 6, x1 + (x2 - x1) * min(done, 100) / 100, top + GANTT_ROW_HEIGHT - 6,
+                                        fill="#628DB6", outline="")
+            canvas.create_text(x2 + 4, top + GANTT_ROW_HEIGHT / 2, text=f"{status} {done or 0}%" + (f" {assignee}" if assignee else ""),
+                               anchor="w", fill="#777", font=("Arial", 9))
+        if self.window_start <= today <= last_day:
+            x = x_of(today) + day_width / 2
+            canvas.create_line(x, 0, x, height, fill="#d9534f", dash=(4, 2))
+        canvas.configure(scrollregion=(0, 0, width, height))
+
+# ============================
+# 10. Settings (效能統計)
+# ============================
+class SettingsView(ctk.CTkFrame):
+    """顯示 instrumentation 收集到的延遲統計 (sql / fetch / job / ui), 可匯出成 JSON。"""
+    def __init__(self, master, db, current_user):
+        super().__init__(master, fg_color="transparent")
+        self.db = db
+        self.current_user = current_user
+
+        top_bar = ctk.CTkFrame(self, fg_color="transparent")
+        top_bar.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(top_bar, text="Performance", font=("Arial", 24, "bold"), text_color="#333").pack(side="left")
+        ctk.CTkButton(top_bar, text="Export...", width=90, command=self.export_stats).pack(side="right")
+        ctk.CTkButton(top_bar, text="Reset", width=70, fg_color="transparent", text_color="#555", border_width=1,
+                      border_color="#ccc", command=self.reset_stats).pack(side="right", padx=5)
+        ctk.CTkButton(top_bar, text="Refresh", width=70, fg_color="transparent", text_color="#555", border_width=1,
+                      border_color="#ccc", command=self.on_show).pack(side="right")
+        self.status_label = ctk.CTkLabel(top_bar, text="", text_color="gray")
+        self.status_label.pack(side="right", padx=10)
+
+        if not instrumentation.ENABLED:
+            ctk.CTkLabel(self, text="Profiling is off. Start the app with MTD_PROFILE=1 to collect query and UI timings.",
+                         text_color="gray").pack(anchor="w", pady=10)
+
+        body = ctk.CTkFrame(self, fg_color="transparent")
+        body.pack(fill="both", expand=True)
+        columns = ("Kind", "Name", "Count", "Total", "Mean", "p50", "p95", "Max")
+        self.tree = ttk.Treeview(body, columns=columns, show="headings")
+        for col, width in zip(columns, (60, 520, 70, 90, 80, 70, 70, 80)):
+            self.tree.heading(col, text=col if col in ("Kind", "Name", "Count") else f"{col} (ms)")
+            self.tree.column(col, width=width, anchor="w" if col in ("Kind", "Name") else "e")
+        scrollbar = ttk.Scrollbar(body, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+    def on_show(self):
+        # 統計只在記憶體裡, 直接讀不必經過 DB 執行緒
+        self.tree.delete(*self.tree.get_children())
+        for kind, name, data in instrumentation.stats.snapshot():
+            self.tree.insert("", "end", values=(kind, name, data["count"], f"{data['total_ms']:.1f}", f"{data['mean_ms']:.2f}",
+                                                data["p50_ms"], data["p95_ms"], f"{data['max_ms']:.1f}"))
+        self.status_label.configure(text=f"{instrumentation.stats.slow_queries} slow queries "
+                                         f"(>= {instrumentation.SLOW_QUERY_MS:g} ms) in {instrumentation.SLOW_QUERY_LOG}")
+
+    def reset_stats(self):
+        instrumentation.stats.reset()
+        self.on_show()
+
+    def export_stats(self):
+        path = filedialog.asksaveasfilename(title="Export timings", defaultextension=".json",
+                                            initialfile="mtd_timings.json", filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            instrumentation.export_stats(path)
+        except OSError as e:
+            messagebox.showerror("Export Error", str(e))
+            return
+        self.status_label.configure(text=f"Exported to {os.path.basename(path)}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MTD_Workplace - Redmine style issue tracker")
+    commands = parser.add_subparsers(dest="command")
+    import_cmd = commands.add_parser("import", help="import issues from a CSV or JSONL file (resumes after errors)")
+    import_cmd.add_argument("path")
+    export_cmd = commands.add_parser("export", help="export all issues to a CSV or JSONL file")
+    export_cmd.add_argument("path")
+    serve_cmd = commands.add_parser("serve", help="run the local JSON API on 127.0.0.1 (no GUI)")
+    serve_cmd.add_argument("--port", type=int, default=API_PORT)
+    serve_cmd.add_argument("--readers", type=int, default=API_READERS, help="reader threads / connections")
+    sync_cmd = commands.add_parser("sync", help="exchange changes since the last sync with another database file "
+                                                "or a shared folder")
+    sync_cmd.add_argument("target", help="another .db file, or a folder (created if missing) shared between machines")
+    sync_cmd.add_argument("--new-site-id", action="store_true",
+                          help="give this database a new site id first (run once on a copied database file)")
+    for cmd in (import_cmd, export_cmd, serve_cmd, sync_cmd):
+        cmd.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    # 沒有指令就開啟 GUI
+    if args.command is None:
+        app = RootApp()
+        app.mainloop()
+        return
+    if args.command == "serve":
+        serve(args.db, args.port, args.readers)
+        return
+    if args.command == "sync":
+        sync(args)
+        return
+
+    conn = connect(args.db)
+    progress = lambda n: print(f"\r{args.command}: {n} rows", end="", file=sys.stderr, flush=True)
+    try:
+        if args.command == "import":
+            count = import_issues(conn, args.path, progress)
+        else:
+            count = export_issues(conn, args.path, progress)
+    except ValueError as e:
+        # 已完成的批次都已提交, 修正檔案後再執行同一個指令會從中斷處繼續
+        print(file=sys.stderr)
+        sys.exit(f"{args.command}: {e}\nFix the file and run the same command again to resume.")
+    except OSError as e:
+        print(file=sys.stderr)
+        sys.exit(f"{args.command}: {e}")
+    finally:
+        conn.close()
+    print(file=sys.stderr)
+    print(f"{args.command}: {count} issues")
+
+def sync(args):
+    # 目標是資料夾 (或以路徑分隔符號結尾) 就用交換檔案的方式, 否則當作另一個資料庫檔
+    conn = connect(args.db)
+    try:
+        if args.new_site_id:
+            print(f"sync: new site id {reset_site_id(conn)}")
+        if os.path.isdir(args.target) or args.target.endswith(("/", os.sep)):
+            pulled, pushed = sync_directory(conn, args.target)
+        elif os.path.exists(args.target):
+            other = connect(args.target)
+            try:
+                pulled, pushed = sync_databases(conn, other)
+            finally:
+                other.close()
+        else:
+            sys.exit(f"sync: {args.target} does not exist")
+    except ValueError as e:
+        sys.exit(f"sync: {e}")
+    finally:
+        conn.close()
+    print(f"sync: received {pulled} changes, sent {pushed} changes")
 
 if __name__ == "__main__":
-    app = RootApp()
-    app.mainloop()
\ No newline at end of file
+    # PyInstaller 打包後, 縮圖用的子行程需要這行才不會重新開啟 GUI
+    multiprocessing.freeze_support()
+    main()
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""Concurrency benchmark: 多個程式同時讀寫同一個 redmine_lite.db。
+
+每個 client 是獨立的程式 (跟多人各自開 app 一樣), 在 --seconds 秒內混合執行
+create_issue (寫) 與 list_issues (讀), 最後彙總吞吐量、延遲與錯誤數。
+
+用法:
+    python benchmarks/bench_concurrency.py --clients 12 --seconds 10 --write-ratio 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import repository  # noqa: E402
+
+def client(db_path, seconds, write_ratio, seed, start_at, results):
+    rng = random.Random(seed)
+    conn = repository.connect(db_path)
+    reads, writes, errors = [], [], 0
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                repository.create_issue(conn, {"tracker": "Bug", "subject": f"client {seed} issue", "status": "New",
+                                               "priority": "Normal", "created_at": "2024-01-01 00:00", "created_by": "bench"})
+                writes.append((time.perf_counter() - started) * 1000)
+            else:
+                repository.list_issues(conn, {"status": "open"})
+                reads.append((time.perf_counter() - started) * 1000)
+        except sqlite3.OperationalError:
+            errors += 1
+    conn.close()
+    results.put((reads, writes, errors))
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent readers/writers against one database file")
+    parser.add_argument("--clients", type=int, default=12)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="fraction of operations that are writes")
+    parser.add_argument("--db", help="database to use (default: a fresh temporary file)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "concurrency.db")
+        repository.connect(db_path).close()
+        results = multiprocessing.Queue()
+        start_at = time.time() + 1.0
+        procs = [multiprocessing.Process(target=client, args=(db_path, args.seconds, args.write_ratio, i, start_at, results))
+                 for i in range(args.clients)]
+        for p in procs:
+            p.start()
+        collected = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+    reads = [ms for r, _, _ in collected for ms in r]
+    writes = [ms for _, w, _ in collected for ms in w]
+    report = {
+        "clients": args.clients, "seconds": args.seconds, "write_ratio": args.write_ratio,
+        "errors": sum(e for _, _, e in collected),
+        "reads_per_sec": round(len(reads) / args.seconds, 1), "writes_per_sec": round(len(writes) / args.seconds, 1),
+        "read_median_ms": round(statistics.median(reads), 3) if reads else 0.0, "read_p95_ms": round(percentile(reads, 0.95), 3),
+        "write_median_ms": round(statistics.median(writes), 3) if writes else 0.0, "write_p95_ms": round(percentile(writes, 0.95), 3),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["errors"] else 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""Storage benchmark: 產生合成資料庫 (預設 10k / 100k / 1M 筆 issues + wiki 頁面), 量測常用操作的時間。
+
+只用 repository (不需要 Tk / 螢幕), 結果輸出成 JSON, 可以跟上一次的結果比較找出效能退步。
+
+用法:
+    python benchmarks/bench_storage.py                                   # 10k, 100k, 1M
+    python benchmarks/bench_storage.py --sizes 10000 --output bench.json
+    python benchmarks/bench_storage.py --compare bench.json              # 比基準慢超過 --threshold 倍就回傳 1
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import repository  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+GENERATE_BATCH = 20_000
+WORDS = ("firmware", "service", "tool", "white", "box", "driver", "crash", "boot", "update", "login", "report",
+         "export", "network", "timeout", "sensor", "calibration", "license", "install", "printer", "memory",
+         "display", "battery", "upload", "config", "customer", "presentation", "material", "release", "patch", "log")
+TRACKERS = ("Support", "Bug", "Feature")
+STATUSES = ("New", "In Progress", "Resolved", "Closed")
+PRIORITIES = ("Normal", "High", "Urgent")
+USERS = tuple(f"user{i:03d}" for i in range(200))
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def synthetic_issues(count, seed):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    for _ in range(count):
+        created = start + timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))
+        yield (rng.choice(TRACKERS), sentence(rng, 6), rng.choice(STATUSES), rng.choice(PRIORITIES),
+               rng.choice(USERS + (None,)), sentence(rng, 40), None, None, rng.choice((0, 10, 20, 50, 80, 100, None)),
+               rng.choice((0.5, 1, 2, 4, 8, None)), created.strftime("%Y-%m-%d %H:%M"), rng.choice(USERS))
+
+def generate_database(path, issues, wiki_pages, revisions, seed=1):
+    """建立合成資料庫 (已存在就直接沿用)。"""
+    if os.path.exists(path):
+        return
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = repository.connect(tmp_path)
+    with conn:
+        conn.executemany("INSERT INTO users VALUES (?, ?)", ((u, repository.hash_password(u)) for u in USERS))
+    rows = synthetic_issues(issues, seed)
+    while True:
+        batch = [row for _, row in zip(range(GENERATE_BATCH), rows)]
+        if not batch:
+            break
+        with conn:
+            conn.executemany(repository.ISSUE_INSERT_SQL, batch)
+    rng = random.Random(seed)
+    for page in range(wiki_pages):
+        lines = [sentence(rng, 12) + "\n" for _ in range(400)]
+        for _ in range(revisions):
+            lines[rng.randrange(len(lines))] = sentence(rng, 12) + "\n"
+            repository.save_wiki_page(conn, f"Page {page}", "".join(lines), rng.choice(USERS))
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+
+def measure(fn, repeat):
+    # 回傳每次執行的毫秒數
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def summarize(dataset, issues, name, timings):
+    timings = sorted(timings)
+    return {
+        "dataset": dataset, "issues": issues, "benchmark": name, "unit": "ms", "repeat": len(timings),
+        "min": round(timings[0], 3), "median": round(statistics.median(timings), 3),
+        "p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3), "max": round(timings[-1], 3),
+    }
+
+def first_page(conn, filters, column, descending):
+    rows = []
+    for phase in repository.issue_sort_phases(column, descending):
+        rows += repository.list_issues(conn, filters, column, descending, phase, limit=repository.ISSUE_PAGE_SIZE - len(rows))
+        if len(rows) >= repository.ISSUE_PAGE_SIZE:
+            break
+    return rows
+
+def run_dataset(path, dataset, issues, repeat):
+    results = []
+    record = lambda name, fn, times=repeat: results.append(summarize(dataset, issues, name, measure(fn, times)))
+
+    # 啟動: 開連線 + 版本檢查 + 第一頁
+    def startup():
+        conn = repository.connect(path)
+        repository.list_issues(conn, {})
+        conn.close()
+    record("startup", startup)
+
+    conn = repository.connect(path)
+    max_id = conn.execute("SELECT MAX(id) FROM issues").fetchone()[0]
+
+    # 列表: 第一頁與很深的一頁 (keyset 分頁兩者應該一樣快)
+    record("list_first_page", lambda: repository.list_issues(conn, {}))
+    record("list_deep_page", lambda: repository.list_issues(conn, {}, after=(None, max_id // 10)))
+
+    # 篩選 / 排序
+    filtered = {
+        "filter_status_open": ({"status": "open"}, "id", True),
+        "filter_assignee": ({"assignee": USERS[7]}, "id", True),
+        "filter_tracker_priority": ({"tracker": "Bug", "priority": "Urgent"}, "id", True),
+        "filter_created_range": ({"created_from": "2022-03-01", "created_to": "2022-03-08"}, "id", True),
+        "sort_subject_open": ({"status": "open"}, "subject", False),
+        "sort_done_assignee": ({"assignee": USERS[7]}, "percent_done", True),
+    }
+    for name, (filters, column, descending) in filtered.items():
+        # 量非 NULL 段 (大部分的列都在這裡)
+        record(name, lambda f=filters, c=column, d=descending: repository.list_issues(conn, f, c, d, "value"))
+    # 由小到大排序時 NULL 段在前面, 跟畫面一樣依序取到滿一頁
+    # (只有幾種值的欄位, SQLite 容易把 NULL 段估成上萬列而全表掃描)
+    first_pages = {
+        "first_page_tracker_asc": ({}, "tracker", False),
+        "first_page_tracker_asc_open": ({"status": "open"}, "tracker", False),
+        "first_page_status_asc_open": ({"status": "open"}, "status", False),
+        "first_page_status_asc_bug": ({"tracker": "Bug"}, "status", False),
+        "first_page_done_asc_assignee": ({"assignee": USERS[7]}, "percent_done", False),
+        # 合成資料沒有 due_date: 沒有符合的列時也不能掃過整個表
+        "first_page_overdue_subject": ({"due": "overdue"}, "subject", False),
+        "first_page_overdue_id": ({"due": "overdue"}, "id", True),
+    }
+    for name, (filters, column, descending) in first_pages.items():
+        record(name, lambda f=filters, c=column, d=descending: first_page(conn, f, c, d))
+
+    record("overview_stats", lambda: repository.load_issue_stats(conn))
+    for term in ("firmware", "white box", "cal"):
+        record(f"search_{term.replace(' ', '_')}", lambda t=term: repository.search_all(conn, t))
+
+    # 寫入: 單筆 (各自提交) 與大量匯入, 量完再刪掉, 資料庫維持原樣
+    new_ids = []
+    sample = next(synthetic_issues(1, seed=99))
+    values = dict(zip(repository.ISSUE_FIELDS, sample))
+    record("insert_single", lambda: new_ids.append(repository.create_issue(conn, values)))
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "issues.jsonl")
+        with open(source, "w", encoding="utf-8") as f:
+            for row in synthetic_issues(10_000, seed=7):
+                f.write(json.dumps(dict(zip(repository.ISSUE_FIELDS, row))) + "\n")
+        before = conn.execute("SELECT MAX(id) FROM issues").fetchone()[0]
+        record("import_10k_rows", lambda: repository.import_issues(conn, source), times=1)
+    with conn:
+        conn.execute("DELETE FROM issues WHERE id > ? OR id IN (%s)" % ",".join("?" * len(new_ids)), [before] + new_ids)
+
+    # Wiki: 清空快取後隨機重建舊版本
+    pages = conn.execute("SELECT page_id, MAX(rev) FROM wiki_revisions GROUP BY page_id").fetchall()
+    rng = random.Random(3)
+    def load_revision():
+        repository.wiki_revision_cache.items.clear()
+        page_id, last = rng.choice(pages)
+        repository.load_wiki_revision(conn, page_id, rng.randint(1, last))
+    if pages:
+        record("wiki_load_revision", load_revision)
+    conn.close()
+    return results
+
+def compare(results, baseline_path, threshold):
+    # 與基準比較 median, 回傳退步的項目
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["dataset"], r["benchmark"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        base = baseline.get((r["dataset"], r["benchmark"]))
+        if base and base["median"] > 0 and r["median"] > base["median"] * threshold:
+            regressions.append((r["dataset"], r["benchmark"], base["median"], r["median"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the MTD_Workplace storage layer on synthetic databases")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="issue counts (default: %(default)s)")
+    parser.add_argument("--wiki-pages", type=int, default=50)
+    parser.add_argument("--wiki-revisions", type=int, default=40, help="revisions per wiki page")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where generated databases are cached")
+    parser.add_argument("--output", help="write results as JSON to this file (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=1.5, help="allowed slowdown factor vs. baseline")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for size in args.sizes:
+        dataset = f"{size // 1000}k" if size < 1_000_000 else f"{size // 1_000_000}M"
+        path = os.path.join(args.data_dir, f"issues_{size}_wiki_{args.wiki_pages}x{args.wiki_revisions}.db")
+        print(f"[{dataset}] preparing {path}", file=sys.stderr)
+        generate_database(path, size, args.wiki_pages, args.wiki_revisions)
+        for r in run_dataset(path, dataset, size, args.repeat):
+            print(f"[{dataset}] {r['benchmark']:<30} median {r['median']:>10.3f} ms   p95 {r['p95']:>10.3f} ms", file=sys.stderr)
+            results.append(r)
+
+    report = {
+        "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "sqlite": sqlite3.sqlite_version, "platform": platform.platform()},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for dataset, name, before, after in regressions:
+            print(f"REGRESSION [{dataset}] {name}: {before:.3f} ms -> {after:.3f} ms", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""效能量測 (opt-in)。
+
+設定環境變數 MTD_PROFILE=1 才會啟用; 沒啟用時連線就是一般的 sqlite3.Connection,
+timed() 也直接回傳原函式, 不會有任何額外成本。
+
+啟用後:
+  - 透過 InstrumentedConnection 執行的每個 SQL 都記錄到延遲直方圖 (依 SQL 分組)
+  - 超過 MTD_SLOW_QUERY_MS (預設 50ms) 的 SQL 連同 EXPLAIN QUERY PLAN 寫到慢查詢紀錄
+  - 用 @timed 標記的畫面建立 / 更新也記錄到直方圖
+結果可以在 Settings 分頁查看, 或用 export_stats() 匯出成 JSON。
+"""
+import bisect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+
+ENABLED = os.environ.get("MTD_PROFILE", "") not in ("", "0")
+SLOW_QUERY_MS = float(os.environ.get("MTD_SLOW_QUERY_MS", "50"))
+SLOW_QUERY_LOG = os.environ.get("MTD_SLOW_QUERY_LOG", "slow_queries.log")
+
+# 直方圖的桶上限 (毫秒), 最後一桶收其餘全部
+BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+SQL_LABEL_LENGTH = 160
+
+class Histogram:
+    """固定桶的延遲直方圖, 百分位數取所在桶的上限。"""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def record(self, ms):
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max, 3),
+            "buckets": dict(zip([f"<={b}" for b in BUCKETS_MS] + ["more"], self.buckets)),
+        }
+
+class Stats:
+    """依 (類別, 名稱) 分組的直方圖。DB 執行緒與 UI 執行緒都會寫入, 所以加鎖。"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.slow_queries = 0
+        self.started = datetime.now()
+
+    def record(self, category, name, ms):
+        with self.lock:
+            hist = self.histograms.get((category, name))
+            if hist is None:
+                hist = self.histograms[(category, name)] = Histogram()
+            hist.record(ms)
+
+    def snapshot(self):
+        # 回傳 [(類別, 名稱, dict)], 依總耗時排序 (最值得優化的在前面)
+        with self.lock:
+            rows = [(cat, name, hist.as_dict()) for (cat, name), hist in self.histograms.items()]
+        return sorted(rows, key=lambda r: r[2]["total_ms"], reverse=True)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.slow_queries = 0
+            self.started = datetime.now()
+
+stats = Stats()
+slow_log_lock = threading.Lock()
+
+def sql_label(sql):
+    # 把 SQL 壓成一行當作分組名稱 (參數用 ? 綁定, 同形狀的查詢會歸在同一組)
+    return re.sub(r"\s+", " ", sql).strip()[:SQL_LABEL_LENGTH]
+
+def log_slow_query(conn, sql, params, ms):
+    plan = []
+    if params is not None and not sql.lstrip().upper().startswith(("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA", "ANALYZE")):
+        try:
+            # 直接用 sqlite3.Cursor.execute, 不要再被量測一次
+            cur = sqlite3.Cursor(conn)
+            plan = [row[-1] for row in sqlite3.Cursor.execute(cur, "EXPLAIN QUERY PLAN " + sql, params)]
+        except sqlite3.Error as e:
+            plan = [f"(no plan: {e})"]
+    # 不記錄參數值 (可能含密碼雜湊等資料)
+    lines = [f"-- {datetime.now().isoformat(timespec='seconds')} {ms:.1f} ms [{threading.current_thread().name}]",
+             sql.strip()]
+    lines += [f"--   {step}" for step in plan]
+    with slow_log_lock:
+        stats.slow_queries += 1
+        with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n\n")
+
+def record_query(conn, kind, sql, params, started):
+    ms = (time.perf_counter() - started) * 1000
+    stats.record(kind, sql_label(sql), ms)
+    if ms >= SLOW_QUERY_MS:
+        log_slow_query(conn, sql, params, ms)
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """量測 execute / executemany / fetch 的 cursor。"""
+    def execute(self, sql, params=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self.last_sql = sql
+            record_query(self.connection, "sql", sql, params, started)
+
+    def executemany(self, sql, seq_of_params):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            self.last_sql = sql
+            record_query(self.connection, "sql", sql, None, started)
+
+    def executescript(self, script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            record_query(self.connection, "sql", script, None, started)
+
+    # SELECT 的大部分時間常在取列, 分開記在 fetch 類別
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            record_query(self.connection, "fetch", getattr(self, "last_sql", "?"), None, started)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(size if size is not None else self.arraysize)
+        finally:
+            record_query(self.connection, "fetch", getattr(self, "last_sql", "?"), None, started)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """conn.execute 之類的捷徑也改走 InstrumentedCursor。"""
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+# sqlite3.connect(..., factory=CONNECTION_FACTORY)
+CONNECTION_FACTORY = InstrumentedConnection if ENABLED else sqlite3.Connection
+
+def timed(name, category="ui"):
+    """標記要量測的函式 (畫面建立 / 更新)。沒啟用時原樣回傳。"""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stats.record(category, name, (time.perf_counter() - started) * 1000)
+        return wrapper
+    return decorator
+
+def export_stats(path):
+    """把目前的統計寫成 JSON。"""
+    report = {
+        "started": stats.started.isoformat(timespec="seconds"),
+        "exported": datetime.now().isoformat(timespec="seconds"),
+        "slow_query_ms": SLOW_QUERY_MS,
+        "slow_query_log": os.path.abspath(SLOW_QUERY_LOG),
+        "slow_queries": stats.slow_queries,
+        "histograms": [dict(category=cat, name=name, **data) for cat, name, data in stats.snapshot()],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
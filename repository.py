@@ -0,0 +1,1482 @@
+"""MTD_Workplace 資料存取層。
+
+所有 SQL 都集中在這裡, 不依賴 Tk, 可以在沒有螢幕的環境直接 import
+(命令列匯入匯出、benchmark)。每個函式都接收一個 sqlite3 連線, 由呼叫端決定在哪個執行緒執行。
+"""
+import bisect
+import csv
+import difflib
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from instrumentation import CONNECTION_FACTORY
+
+# 資料庫設定
+DB_PATH = "redmine_lite.db"
+SQL_MAX_PARAMS = 500       # 單一 IN (...) 最多放幾個參數
+STATEMENT_CACHE_SIZE = 256 # 篩選 / 排序的 SQL 形狀固定, 放大 statement cache 讓 prepared statement 重複使用
+
+# 多人共用同一個 DB 檔
+BUSY_TIMEOUT_MS = 5000     # 拿不到鎖時 SQLite 自己等待的時間
+WRITE_RETRIES = 6          # busy_timeout 用完後, 再退避重試幾次
+RETRY_BASE_DELAY = 0.05    # 第一次重試前等待的秒數, 之後每次加倍 (加上隨機抖動)
+
+# Issues 列表一次取的筆數
+ISSUE_PAGE_SIZE = 100
+# 篩選 / NULL 段在索引上少於這個筆數時, 指定走該索引 (見 issue_list_index)
+LIST_INDEX_RANGE_ROWS = 2000
+
+def open_connection(db_path=DB_PATH):
+    """開啟設定好並行存取的連線 (不升級結構)。
+
+    WAL 模式下讀取不會被寫入擋住 (讀的是開始時的快照), 寫入也不會被讀取擋住;
+    同一時間仍只有一個寫入者, 所以寫入一律用 write_transaction() 短交易。
+    """
+    conn = sqlite3.connect(db_path, cached_statements=STATEMENT_CACHE_SIZE, factory=CONNECTION_FACTORY,
+                           timeout=BUSY_TIMEOUT_MS / 1000)
+    # journal_mode 會記在檔案裡, 只有第一次需要切換 (切換時需要短暫獨佔, 所以也要重試)
+    if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+        retry_on_busy(lambda: conn.execute("PRAGMA journal_mode=WAL").fetchone())
+    # WAL 下 NORMAL 不會損毀資料庫, 只有斷電時可能少掉最後幾筆提交; 每次提交不必 fsync
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def connect(db_path=DB_PATH):
+    """開啟連線並升級資料庫結構 (已是最新版時只是一次版本檢查)。"""
+    conn = open_connection(db_path)
+    migrate(conn)
+    return conn
+
+def is_busy(error):
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+def retry_on_busy(operation):
+    """執行 operation(); 遇到 database is locked 時以指數退避 + 抖動重試。"""
+    for attempt in range(WRITE_RETRIES + 1):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if not is_busy(e) or attempt == WRITE_RETRIES:
+                raise
+            time.sleep(RETRY_BASE_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+@contextmanager
+def write_transaction(conn):
+    """短寫入交易: BEGIN IMMEDIATE 一開始就拿寫入鎖, 結束時提交 (出錯則 rollback)。
+
+    一般的 with conn: 是先讀後寫 (DEFERRED), 兩個連線同時從讀鎖升級成寫鎖時,
+    SQLite 會直接回 database is locked 而不等待 busy_timeout;
+    先拿寫入鎖就只會排隊, 而且交易中讀到的資料到提交前都不會被別人改掉。
+    """
+    retry_on_busy(lambda: conn.execute("BEGIN IMMEDIATE"))
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+def chunked(items, size=SQL_MAX_PARAMS):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+# 日期一律存成可排序的字串: 日期 YYYY-MM-DD, 時間 YYYY-MM-DD HH:MM (字串大小 = 時間先後, 可用索引做範圍查詢)
+DATE_FORMAT = "%Y-%m-%d"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+# 舊資料 / 匯入檔常見的寫法
+DATE_INPUT_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%Y%m%d", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S",
+                      "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S", "%Y/%m/%d %H:%M", "%Y/%m/%d %H:%M:%S")
+
+def parse_datetime(text):
+    text = text.strip()
+    for fmt in DATE_INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid date: {text!r} (use YYYY-MM-DD)")
+
+def normalize_date(value):
+    """轉成 YYYY-MM-DD; 空值回傳 None, 無法解析時丟 ValueError。"""
+    if value is None or not str(value).strip():
+        return None
+    return parse_datetime(str(value)).strftime(DATE_FORMAT)
+
+def normalize_timestamp(value):
+    """轉成 YYYY-MM-DD HH:MM; 空值回傳 None, 無法解析時丟 ValueError。"""
+    if value is None or not str(value).strip():
+        return None
+    return parse_datetime(str(value)).strftime(TIMESTAMP_FORMAT)
+
+# ============================
+# 資料庫結構遷移 (PRAGMA user_version)
+# ============================
+def migrate_v1_base_schema(cur):
+    # 1. 使用者表
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT
+        )
+    ''')
+    
+    # 2. Issues 表 (擴充欄位以符合截圖)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS issues (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tracker TEXT,       -- Support / Bug
+            subject TEXT,
+            status TEXT,        -- New / In Progress...
+            priority TEXT,
+            assignee TEXT,      -- 指派給誰
+            description TEXT,
+            start_date TEXT,
+            due_date TEXT,
+            percent_done INTEGER,
+            estimated_hours REAL,
+            created_at TEXT,
+            created_by TEXT
+        )
+    ''')
+    
+    # 3. Wiki 表
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS wiki (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT UNIQUE,
+            content TEXT,
+            updated_by TEXT
+        )
+    ''')
+
+    # 舊版資料庫缺少的欄位 (只補真的沒有的)
+    existing = {row[1] for row in cur.execute("PRAGMA table_info(issues)")}
+    columns_to_add = [
+        ("tracker", "TEXT"), ("assignee", "TEXT"), ("start_date", "TEXT"),
+        ("due_date", "TEXT"), ("percent_done", "INTEGER"), ("estimated_hours", "REAL"),
+        ("created_by", "TEXT")
+    ]
+    for col_name, col_type in columns_to_add:
+        if col_name not in existing:
+            cur.execute(f"ALTER TABLE issues ADD COLUMN {col_name} {col_type}")
+
+def migrate_v2_change_log(cur):
+    # 變更紀錄 (由 trigger 寫入), 讓其他程式只需讀取新增的變更
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT,
+            row_id INTEGER,
+            op TEXT             -- insert / update / delete
+        )
+    ''')
+    for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS issues_log_{op.lower()} AFTER {op} ON issues
+            BEGIN
+                INSERT INTO change_log (tbl, row_id, op) VALUES ('issues', {row}.id, '{op.lower()}');
+            END
+        ''')
+
+def migrate_v3_issue_indexes(cur):
+    # Issues 列表篩選 / 排序用的複合索引 (每個欄位都帶上 id, 配合 keyset 分頁)
+    for column in ("status", "tracker", "priority", "assignee", "created_at", "subject", "percent_done"):
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_issues_{column} ON issues ({column}, id)")
+    # 沒有統計資料時 SQLite 容易選錯索引 (先篩選再整批排序), 建好索引後跑一次 ANALYZE
+    cur.execute("ANALYZE issues")
+
+def migrate_v4_full_text_search(cur):
+    # FTS5 全文索引 (external content: 不重複存一份文字), 由 trigger 與原表保持同步
+    for table, key, columns in (("issues", "id", ("subject", "description")), ("wiki", "id", ("title", "content"))):
+        fts = f"{table}_fts"
+        cols = ", ".join(columns)
+        new_cols = ", ".join(f"new.{c}" for c in columns)
+        old_cols = ", ".join(f"old.{c}" for c in columns)
+        cur.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='{key}', prefix='2 3')")
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.{key}, {new_cols});
+            END
+        ''')
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.{key}, {old_cols});
+            END
+        ''')
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.{key}, {old_cols});
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.{key}, {new_cols});
+            END
+        ''')
+        # 既有資料一次建好索引
+        cur.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+def migrate_v5_import_progress(cur):
+    # 大量匯入的進度 (與每批資料在同一個交易內更新), 中斷後可從這裡續傳
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS import_progress (
+            source TEXT PRIMARY KEY,    -- 匯入檔案的絕對路徑
+            rows_done INTEGER
+        )
+    ''')
+
+def migrate_v6_wiki_change_log(cur):
+    # Wiki 也寫入變更紀錄, 快取中的 Wiki 畫面才知道內容是否過期
+    for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS wiki_log_{op.lower()} AFTER {op} ON wiki
+            BEGIN
+                INSERT INTO change_log (tbl, row_id, op) VALUES ('wiki', {row}.id, '{op.lower()}');
+            END
+        ''')
+
+# Overview 統計的維度 (issues 的欄位)
+STATS_DIMENSIONS = ("status", "tracker", "priority", "assignee")
+
+def migrate_v7_issue_stats(cur):
+    # Overview 用的彙總表: 每個維度每個值的 issue 數與預估工時, 由 trigger 隨 issues 增減
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS issue_stats (
+            dimension TEXT,         -- status / tracker / priority / assignee
+            value TEXT,             -- 空字串代表未設定
+            issue_count INTEGER,
+            estimated_hours REAL,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    ''')
+    add = lambda row: " ".join(f'''
+        INSERT INTO issue_stats VALUES ('{dim}', COALESCE({row}.{dim}, ''), 1, COALESCE({row}.estimated_hours, 0))
+            ON CONFLICT (dimension, value) DO UPDATE SET issue_count = issue_count + 1,
+            estimated_hours = estimated_hours + excluded.estimated_hours;''' for dim in STATS_DIMENSIONS)
+    remove = lambda row: " ".join(f'''
+        UPDATE issue_stats SET issue_count = issue_count - 1, estimated_hours = estimated_hours - COALESCE({row}.estimated_hours, 0)
+            WHERE dimension = '{dim}' AND value = COALESCE({row}.{dim}, '');''' for dim in STATS_DIMENSIONS)
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS issue_stats_insert AFTER INSERT ON issues BEGIN {add('new')} END")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS issue_stats_delete AFTER DELETE ON issues BEGIN {remove('old')} END")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS issue_stats_update AFTER UPDATE OF {', '.join(STATS_DIMENSIONS)}, estimated_hours "
+                f"ON issues BEGIN {remove('old')} {add('new')} END")
+    # 既有資料一次算好
+    cur.execute("DELETE FROM issue_stats")
+    for dim in STATS_DIMENSIONS:
+        cur.execute(f"INSERT INTO issue_stats SELECT '{dim}', COALESCE({dim}, ''), COUNT(*), TOTAL(estimated_hours) "
+                    f"FROM issues GROUP BY COALESCE({dim}, '')")
+
+def migrate_v8_wiki_revisions(cur):
+    # Wiki 版本歷史: 定期存完整內容, 其他版本只存 delta (都經過 zlib 壓縮)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS wiki_revisions (
+            page_id INTEGER,
+            rev INTEGER,        -- 1, 2, 3...
+            kind TEXT,          -- full / delta
+            data BLOB,
+            author TEXT,
+            created_at TEXT,
+            PRIMARY KEY (page_id, rev)
+        )
+    ''')
+    # 既有頁面的目前內容當作第 1 版
+    for page_id, content, author in cur.execute("SELECT id, content, updated_by FROM wiki").fetchall():
+        cur.execute("INSERT OR IGNORE INTO wiki_revisions VALUES (?, 1, 'full', ?, ?, ?)",
+                    (page_id, zlib.compress((content or "").encode("utf-8")), author, datetime.now().strftime("%Y-%m-%d %H:%M")))
+
+def migrate_v9_attachments(cur):
+    # 附件只存中繼資料, 內容依 SHA-256 存在 ATTACHMENTS_DIR (相同內容只存一份)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT,
+            sha256 TEXT,
+            size INTEGER,
+            uploaded_by TEXT,
+            uploaded_at TEXT
+        )
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_attachments_sha256 ON attachments (sha256)")
+    for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS attachments_log_{op.lower()} AFTER {op} ON attachments
+            BEGIN
+                INSERT INTO change_log (tbl, row_id, op) VALUES ('attachments', {row}.id, '{op.lower()}');
+            END
+        ''')
+
+# 日期欄位: (遷移時用的轉換函式, 標準格式檢查)。
+# '+0 days' 會把 02-30 之類不存在的日期換成別天, 所以只有合法的標準格式會原樣傳回
+ISSUE_DATE_COLUMNS = {
+    "start_date": ("normalize_date", "date({v}, '+0 days')"),
+    "due_date": ("normalize_date", "date({v}, '+0 days')"),
+    "created_at": ("normalize_timestamp", "strftime('%Y-%m-%d %H:%M', {v}, '+0 days')"),
+}
+
+def lenient(convert):
+    # 遷移用: 無法解析就回傳 NULL, 不讓整個遷移失敗
+    def wrapper(value):
+        try:
+            return convert(value)
+        except ValueError:
+            return None
+    return wrapper
+
+def migrate_v10_normalize_dates(cur):
+    conn = cur.connection
+    conn.create_function("normalize_date", 1, lenient(normalize_date), deterministic=True)
+    conn.create_function("normalize_timestamp", 1, lenient(normalize_timestamp), deterministic=True)
+    # 無法解析的舊值不直接丟掉, 保留在 invalid_dates 方便人工補正
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS invalid_dates (
+            issue_id INTEGER,
+            column_name TEXT,
+            value TEXT,
+            PRIMARY KEY (issue_id, column_name)
+        )
+    ''')
+    for column, (convert, check) in ISSUE_DATE_COLUMNS.items():
+        # 已經是標準格式的列用內建的 date() 就能判斷, 只有其餘的列才呼叫 Python
+        needs_fix = f"{column} IS NOT NULL AND {check.format(v=column)} IS NOT {column}"
+        cur.execute(f"INSERT OR REPLACE INTO invalid_dates SELECT id, '{column}', {column} FROM issues "
+                    f"WHERE {needs_fix} AND TRIM({column}) != '' AND {convert}({column}) IS NULL")
+        cur.execute(f"UPDATE issues SET {column} = {convert}({column}) WHERE {needs_fix}")
+        # 之後不論是哪個版本的程式寫入, 都只能寫標準格式
+        for op, event in (("insert", "INSERT"), ("update", f"UPDATE OF {column}")):
+            cur.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS issues_check_{column}_{op} BEFORE {event} ON issues
+                WHEN new.{column} IS NOT NULL AND {check.format(v=f"new.{column}")} IS NOT new.{column}
+                BEGIN
+                    SELECT RAISE(ABORT, 'issues.{column} is not a valid date');
+                END
+            ''')
+    # 甘特圖: 依 due_date 範圍掃描, start_date 也在索引裡, 不重疊的列不必回表
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_issues_due_start ON issues (due_date, start_date)")
+    cur.execute("ANALYZE issues")
+
+def migrate_v11_users_change_log(cur):
+    # users 的主鍵是帳號, change_log.row_id 直接記帳號 (與 notify("users", ...) 的 id 一致)
+    # 注意: 純數字的帳號會被 INTEGER affinity 轉成數字, v14 改掉了
+    for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS users_log_{op.lower()} AFTER {op} ON users
+            BEGIN
+                INSERT INTO change_log (tbl, row_id, op) VALUES ('users', {row}.username, '{op.lower()}');
+            END
+        ''')
+
+# 同步的資料表: (跨資料庫識別的 uid, 本機 row_id)。
+# issues 的 id 各台自己編號, 新增時以「site_id-序號」當 uid (全域唯一, 而且依序附加在索引尾端);
+# wiki 以標題、users 以帳號識別 (兩台各自建立同名頁面會合併)
+SYNC_TABLES = {
+    "issues": ("site || '-' || seq", "{row}.id"),
+    "wiki": ("{row}.title", "{row}.id"),
+    "users": ("{row}.username", "{row}.username"),
+}
+
+def issue_uid(issue_id, created_at, created_by, subject):
+    # 遷移前就存在的 issue 由內容決定 uid: 從同一個 DB 檔複製出去的筆電, 同一筆會得到同一個 uid
+    key = "\x1f".join(str(v) for v in (issue_id, created_at, created_by, subject))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:32]
+
+def migrate_v12_sync(cur):
+    conn = cur.connection
+    conn.create_function("issue_uid", 4, issue_uid, deterministic=True)
+    # site_id: 這個資料庫的識別; clock: Lamport 時鐘 (版本號); seq: 本機變更序號 (同步點)
+    cur.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value) WITHOUT ROWID")
+    cur.execute("INSERT OR IGNORE INTO sync_state VALUES ('site_id', lower(hex(randomblob(8)))), ('clock', 0), ('seq', 0)")
+    cur.execute('''
+        CREATE VIEW IF NOT EXISTS sync_stamp AS SELECT
+            (SELECT value FROM sync_state WHERE key = 'clock') AS version,
+            (SELECT value FROM sync_state WHERE key = 'site_id') AS site,
+            (SELECT value FROM sync_state WHERE key = 'seq') AS seq
+    ''')
+    # 每一列目前的版本 (version, site) 與最後變更的本機序號; 刪除的列留下 tombstone 讓刪除也能同步
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS row_versions (
+            tbl TEXT,
+            uid TEXT,
+            row_id,             -- 本機的 id (users 為帳號)
+            version INTEGER,
+            site TEXT,          -- 寫入這個版本的 site_id
+            deleted INTEGER,
+            seq INTEGER,
+            PRIMARY KEY (tbl, uid)
+        ) WITHOUT ROWID
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_row_versions_row ON row_versions (tbl, row_id)")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_row_versions_seq ON row_versions (seq)")
+    # 對方已經送過來的最後一個序號 (下次只要之後的變更)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS sync_peers (
+            site TEXT PRIMARY KEY,
+            received_seq INTEGER,
+            synced_at TEXT
+        )
+    ''')
+    bump = "UPDATE sync_state SET value = value + 1 WHERE key IN ('clock', 'seq');"
+    # row_id 沒有型別; 直接比較 old.id 會把欄位轉成 INTEGER 而用不到索引, 前面加 + 去掉型別
+    for table, (uid, row_id) in SYNC_TABLES.items():
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_sync_insert AFTER INSERT ON {table}
+            BEGIN
+                {bump}
+                INSERT INTO row_versions SELECT '{table}', {uid.format(row="new")}, {row_id.format(row="new")}, version, site, 0, seq
+                    FROM sync_stamp WHERE true
+                    ON CONFLICT (tbl, uid) DO UPDATE SET row_id = excluded.row_id, version = excluded.version,
+                    site = excluded.site, deleted = 0, seq = excluded.seq;
+            END
+        ''')
+        for op, deleted in (("UPDATE", 0), ("DELETE", 1)):
+            cur.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_sync_{op.lower()} AFTER {op} ON {table}
+                BEGIN
+                    {bump}
+                    UPDATE row_versions SET (version, site, deleted, seq) = (SELECT version, site, {deleted}, seq FROM sync_stamp)
+                        WHERE tbl = '{table}' AND row_id = +{row_id.format(row="old")};
+                END
+            ''')
+    # 既有資料都是第 0 版、不屬於任何 site: 同一個 DB 檔複製出去的幾台, 這些列的版本完全相同, 同步時直接略過
+    backfill = " UNION ALL ".join((
+        "SELECT 'issues' AS tbl, issue_uid(id, created_at, created_by, subject) AS uid, id AS row_id FROM issues",
+        "SELECT 'wiki', title, id FROM wiki",
+        "SELECT 'users', username, username FROM users",
+    ))
+    cur.execute(f"INSERT OR IGNORE INTO row_versions SELECT tbl, uid, row_id, 0, '', 0, "
+                f"ROW_NUMBER() OVER () FROM ({backfill})")
+    cur.execute("UPDATE sync_state SET value = (SELECT COALESCE(MAX(seq), 0) FROM row_versions) WHERE key = 'seq'")
+
+def migrate_v13_overdue_index(cur):
+    # 「已逾期」是未結案 + due_date 早於今天: 兩個 status 值各讀一段 due_date 範圍, 已結案的舊 issue 不必掃過
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_issues_status_due ON issues (status, due_date)")
+    cur.execute("ANALYZE issues")
+
+def migrate_v14_users_change_log_text(cur):
+    # change_log.row_id 是 INTEGER affinity, "007" 這種帳號存進去會變成 7 而且救不回來;
+    # 改記 'u:' + 帳號 (不像數字, 會原樣保存), read_changes 讀出時再拿掉前綴
+    for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        cur.execute(f"DROP TRIGGER IF EXISTS users_log_{op.lower()}")
+        cur.execute(f'''
+            CREATE TRIGGER users_log_{op.lower()} AFTER {op} ON users
+            BEGIN
+                INSERT INTO change_log (tbl, row_id, op) VALUES ('users', 'u:' || {row}.username, '{op.lower()}');
+            END
+        ''')
+    # 舊紀錄一起換成新格式 (已經被轉成數字的只能照數字記)
+    cur.execute("UPDATE change_log SET row_id = 'u:' || row_id WHERE tbl = 'users'")
+
+def migrate_v15_blank_dates(cur):
+    # 舊版程式把空白的 Start / Due 存成 '', v10 的檢查卻把 '' 當成不合法的日期, 共用同一個 DB 檔的舊版就無法新增 issue;
+    # 改成放行 '', 寫入後再換成 NULL (新版程式本來就存 NULL)
+    for column, (_, check) in ISSUE_DATE_COLUMNS.items():
+        for op, event in (("insert", "INSERT"), ("update", f"UPDATE OF {column}")):
+            cur.execute(f"DROP TRIGGER IF EXISTS issues_check_{column}_{op}")
+            cur.execute(f'''
+                CREATE TRIGGER issues_check_{column}_{op} BEFORE {event} ON issues
+                WHEN new.{column} IS NOT NULL AND new.{column} != '' AND {check.format(v=f"new.{column}")} IS NOT new.{column}
+                BEGIN
+                    SELECT RAISE(ABORT, 'issues.{column} is not a valid date');
+                END
+            ''')
+            cur.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS issues_blank_{column}_{op} AFTER {event} ON issues
+                WHEN new.{column} = ''
+                BEGIN
+                    UPDATE issues SET {column} = NULL WHERE id = new.id;
+                END
+            ''')
+
+def migrate_v16_users_nocase_index(cur):
+    # API 的帳號前綴查詢不分大小寫: 用 NOCASE 索引讀一段範圍, 不必掃過整個 users
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_nocase ON users (username COLLATE NOCASE)")
+
+# 依序套用; 第 N 個遷移完成後 user_version = N。只能在最後面新增, 不要改動已發佈的遷移
+MIGRATIONS = [
+    migrate_v1_base_schema,
+    migrate_v2_change_log,
+    migrate_v3_issue_indexes,
+    migrate_v4_full_text_search,
+    migrate_v5_import_progress,
+    migrate_v6_wiki_change_log,
+    migrate_v7_issue_stats,
+    migrate_v8_wiki_revisions,
+    migrate_v9_attachments,
+    migrate_v10_normalize_dates,
+    migrate_v11_users_change_log,
+    migrate_v12_sync,
+    migrate_v13_overdue_index,
+    migrate_v14_users_change_log_text,
+    migrate_v15_blank_dates,
+    migrate_v16_users_nocase_index,
+]
+
+def migrate(conn):
+    """把資料庫升級到最新版本, 每個遷移只執行一次, 且各自在一個交易內完成。
+
+    已是最新版本時只有一次 PRAGMA user_version 查詢。
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number in range(version + 1, len(MIGRATIONS) + 1):
+        with write_transaction(conn):
+            # 拿到寫入鎖後再確認一次: 同時啟動的另一個程式可能已經做完這一步
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= number:
+                continue
+            MIGRATIONS[number - 1](conn.cursor())
+            conn.execute(f"PRAGMA user_version = {number}")
+
+# ============================
+# 使用者
+# ============================
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def authenticate(conn, username, password):
+    return conn.execute("SELECT 1 FROM users WHERE username=? AND password=?",
+                        (username, hash_password(password))).fetchone() is not None
+
+def register_user(conn, username, password):
+    """新增使用者; 帳號已存在時回傳 False。"""
+    with write_transaction(conn):
+        if conn.execute("SELECT 1 FROM users WHERE username=?", (username,)).fetchone():
+            return False
+        conn.execute("INSERT INTO users VALUES (?, ?)", (username, hash_password(password)))
+    return True
+
+def list_usernames(conn):
+    return [row[0] for row in conn.execute("SELECT username FROM users ORDER BY username")]
+
+def list_usernames_with_prefix(conn, prefix):
+    """帳號以 prefix 開頭 (不分大小寫, 只限 ASCII) 的使用者, 走 idx_users_nocase 只讀符合的範圍。"""
+    if not prefix:
+        return list_usernames(conn)
+    return [row[0] for row in conn.execute(
+        "SELECT username FROM users WHERE username COLLATE NOCASE >= ? AND username COLLATE NOCASE < ? "
+        "ORDER BY username COLLATE NOCASE", (prefix, prefix + "\U0010ffff"))]
+
+ASSIGNEE_MATCHES = 8    # 自動完成最多列出幾個
+
+class UserIndex:
+    """記憶體內的使用者名稱索引 (不分大小寫排序), 用 bisect 做前綴查詢。
+
+    只需要載入一次, 之後依 users 的變更事件 add / remove;
+    查詢是 O(log n + limit), 與使用者總數幾乎無關。
+    """
+    def __init__(self, names=()):
+        self.keys = []
+        self.names = []
+        self.loaded = False
+        if names:
+            self.load(names)
+
+    def load(self, names):
+        # 使用者很多時排序要一點時間, 可以在背景建好新的索引再用 replace() 換上
+        self.names = sorted(set(names), key=lambda name: (name.casefold(), name))
+        self.keys = [name.casefold() for name in self.names]
+        self.loaded = True
+
+    def replace(self, other):
+        self.keys, self.names, self.loaded = other.keys, other.names, other.loaded
+
+    def add(self, name):
+        if name in self:
+            return
+        i = bisect.bisect_left(self.keys, name.casefold())
+        self.keys.insert(i, name.casefold())
+        self.names.insert(i, name)
+
+    def remove(self, name):
+        i = self.position(name)
+        if i is not None:
+            del self.keys[i]
+            del self.names[i]
+
+    def position(self, name):
+        key = name.casefold()
+        i = bisect.bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.names[i] == name:
+                return i
+            i += 1
+        return None
+
+    def __contains__(self, name):
+        return self.position(name) is not None
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefix(self, text, limit=ASSIGNEE_MATCHES):
+        # 找到第一個 >= 前綴的位置, 往後取到不再符合或滿 limit 為止
+        key = text.casefold()
+        i = bisect.bisect_left(self.keys, key)
+        matches = []
+        while i < len(self.keys) and len(matches) < limit and self.keys[i].startswith(key):
+            matches.append(self.names[i])
+            i += 1
+        return matches
+
+# ============================
+# 變更紀錄 (change_log)
+# ============================
+def data_version(conn):
+    # 只在「其他連線」提交後才會變, 用來便宜地判斷要不要讀 change_log
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+# users 的 change_log.row_id 前綴 (見 migrate_v14_users_change_log_text)
+USER_CHANGE_PREFIX = "u:"
+# 會寫入 change_log 的資料表
+CHANGE_LOG_TABLES = ("issues", "wiki", "users", "attachments")
+# change_log 只保留最新的這麼多筆; 更早的變更所有開著的程式早就讀過了 (每秒讀一次)
+CHANGE_LOG_KEEP_ROWS = 100_000
+# 一次最多讀這麼多筆變更; 更多時 (例如其他程式剛匯入大量資料) 直接請畫面重新載入, 比逐列修補便宜
+CHANGE_READ_LIMIT = 1000
+
+def latest_change_seq(conn):
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+def read_changes(conn, after_seq):
+    """讀取 after_seq 之後的變更, 回傳 (最後的 seq, {(table, op): [row_id, ...]})。
+
+    同一列多次變更只保留最後結果 (新增後又修改仍算新增)。
+    變更超過 CHANGE_READ_LIMIT 筆, 或落後太多、中間的紀錄已被 prune_change_log 清掉時,
+    第二個值為 None (呼叫端應整個重新載入)。
+    """
+    rows = conn.execute("SELECT seq, tbl, row_id, op FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                        (after_seq, CHANGE_READ_LIMIT + 1)).fetchall()
+    if not rows:
+        return after_seq, {}
+    if len(rows) > CHANGE_READ_LIMIT:
+        return latest_change_seq(conn), None
+    # seq 是 AUTOINCREMENT (rollback 也不會跳號), 不連續就代表有紀錄被清掉了
+    if after_seq and rows[0][0] > after_seq + 1:
+        return rows[-1][0], None
+    final_ops = {}
+    for _, tbl, row_id, op in rows:
+        if tbl == "users":
+            row_id = row_id[len(USER_CHANGE_PREFIX):]
+        previous = final_ops.get((tbl, row_id))
+        if op == "update" and previous == "insert":
+            op = "insert"
+        final_ops[(tbl, row_id)] = op
+    grouped = {}
+    for (tbl, row_id), op in final_ops.items():
+        grouped.setdefault((tbl, op), []).append(row_id)
+    return rows[-1][0], grouped
+
+def prune_change_log(conn, keep=CHANGE_LOG_KEEP_ROWS):
+    """只保留最新的 keep 筆變更紀錄, 回傳刪除的筆數。
+
+    一定會留下最新的一筆, MAX(seq) (API 的 ETag) 不會倒退; seq 是主鍵, 刪除只是一段範圍。
+    """
+    with write_transaction(conn):
+        return conn.execute("DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (keep,)).rowcount
+
+# ============================
+# Issues 查詢
+# ============================
+ISSUE_FIELDS = ("tracker", "subject", "status", "priority", "assignee", "description", "start_date",
+                "due_date", "percent_done", "estimated_hours", "created_at", "created_by")
+ISSUE_INSERT_SQL = f"INSERT INTO issues ({', '.join(ISSUE_FIELDS)}) VALUES ({', '.join('?' * len(ISSUE_FIELDS))})"
+
+# 列表欄位 (顯示名稱 -> 資料表欄位), 也是可排序欄位的白名單
+ISSUE_LIST_COLUMNS = {
+    "ID": "id", "Tracker": "tracker", "Status": "status", "Subject": "subject",
+    "Assignee": "assignee", "% Done": "percent_done", "Created": "created_at",
+}
+ISSUE_LIST_SELECT = "SELECT id, tracker, status, subject, assignee, percent_done, created_at FROM issues"
+OPEN_STATUSES = ("New", "In Progress")
+
+def issue_filter_clause(filters):
+    """把篩選條件轉成 (WHERE 條件列表, 參數), 全部使用參數化 SQL。
+
+    filters 的 key: status ("open" 代表未結案), tracker, priority, assignee,
+    created_from (含), created_to (不含), due ("overdue" 已逾期且未結案 / "this_week" 本週到期);
+    值為 None 或空字串代表不篩選。
+    """
+    where, params = [], []
+    status = filters.get("status")
+    if status == "open":
+        where.append(f"status IN ({','.join('?' * len(OPEN_STATUSES))})")
+        params += OPEN_STATUSES
+    elif status:
+        where.append("status = ?")
+        params.append(status)
+    for column in ("tracker", "priority", "assignee"):
+        if filters.get(column):
+            where.append(f"{column} = ?")
+            params.append(filters[column])
+    if filters.get("created_from"):
+        where.append("created_at >= ?")
+        params.append(filters["created_from"])
+    if filters.get("created_to"):
+        where.append("created_at < ?")
+        params.append(filters["created_to"])
+    today = date.today()
+    if filters.get("due") == "overdue":
+        where.append(f"due_date < ? AND status IN ({','.join('?' * len(OPEN_STATUSES))})")
+        params += [today.isoformat(), *OPEN_STATUSES]
+    elif filters.get("due") == "this_week":
+        monday = today - timedelta(days=today.weekday())
+        where.append("due_date BETWEEN ? AND ?")
+        params += [monday.isoformat(), (monday + timedelta(days=6)).isoformat()]
+    return where, params
+
+# 篩選條件 -> 它限定的欄位 (有設定時該欄位一定不是 NULL)
+FILTER_COLUMNS = {"status": "status", "tracker": "tracker", "priority": "priority", "assignee": "assignee",
+                  "created_from": "created_at", "created_to": "created_at", "due": "due_date"}
+
+# 到期篩選 -> 要走的索引
+DUE_FILTER_INDEXES = {"overdue": "idx_issues_status_due", "this_week": "idx_issues_due_start"}
+
+def issue_sort_phases(sort_column, descending):
+    # 可能為 NULL 的欄位分兩段取: 非 NULL 的列, 以及 NULL 的列 (SQLite 中 NULL 最小)
+    if sort_column == "id":
+        return ("value",)
+    return ("value", "null") if descending else ("null", "value")
+
+def build_issue_query(filters, sort_column="id", descending=True, phase="value", after=None, limit=ISSUE_PAGE_SIZE,
+                      index=None):
+    """組出 issue 列表一頁的 SQL (keyset 分頁)。
+
+    after 為上一頁最後一列的 (排序值, id)。用 (欄位, id) 的 row value 比較,
+    讓 SQLite 直接從 (欄位, id) 複合索引的位置往下讀, 不需要 OFFSET 或額外排序。
+    index 指定要走的索引 (見 issue_list_index)。
+    """
+    if sort_column not in ISSUE_LIST_COLUMNS.values():
+        raise ValueError(f"Unknown sort column: {sort_column}")
+    where, params = issue_filter_clause(filters)
+    op = "<" if descending else ">"
+    direction = "DESC" if descending else "ASC"
+    if sort_column == "id":
+        if after:
+            where.append(f"id {op} ?")
+            params.append(after[1])
+        order = f"id {direction}"
+    elif phase == "null":
+        where.append(f"{sort_column} IS NULL")
+        if after:
+            where.append(f"id {op} ?")
+            params.append(after[1])
+        order = f"id {direction}"
+    else:
+        where.append(f"{sort_column} IS NOT NULL")
+        if after:
+            where.append(f"({sort_column}, id) {op} (?, ?)")
+            params += after
+        order = f"{sort_column} {direction}, id {direction}"
+    sql = ISSUE_LIST_SELECT
+    if index:
+        sql += f" INDEXED BY {index}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+    return sql, params
+
+def index_range_below(conn, index, where, params, limit):
+    # 只在索引上數符合 where 的列, 最多數 limit 筆 (不回表, 不到 1ms); 少於 limit 時回傳 True
+    return conn.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM issues INDEXED BY {index} WHERE {' AND '.join(where)} LIMIT ?)",
+                        params + [limit]).fetchone()[0] < limit
+
+def issue_list_index(conn, filters, sort_column, phase):
+    """決定這一頁要不要指定索引, 回傳索引名稱或 None (交給 SQLite 選)。
+
+    ANALYZE 只記錄每個值平均幾列, 估不準兩種情況:
+    - tracker / status 這類只有幾種值的欄位, SQLite 會以為「IS NULL」也有上萬列而全表掃描;
+    - 到期篩選沒有符合的列時, SQLite 會沿著排序欄位的索引一路掃到底。
+    先在索引上數一下範圍, 範圍小就指定那個索引 (最多讀 LIST_INDEX_RANGE_ROWS 筆再排序);
+    範圍大時 (例如 % Done 的 NULL、很多逾期) 沿排序欄位的索引很快就湊滿一頁, 交給 SQLite。
+    """
+    due = filters.get("due")
+    if due in DUE_FILTER_INDEXES:
+        where, params = issue_filter_clause({"due": due})
+        if index_range_below(conn, DUE_FILTER_INDEXES[due], where, params, LIST_INDEX_RANGE_ROWS):
+            return DUE_FILTER_INDEXES[due]
+    if phase == "null" and sort_column != "id":
+        index = f"idx_issues_{sort_column}"
+        if index_range_below(conn, index, [f"{sort_column} IS NULL"], [], LIST_INDEX_RANGE_ROWS):
+            return index
+    return None
+
+def list_issues(conn, filters, sort_column="id", descending=True, phase="value", after=None, limit=ISSUE_PAGE_SIZE):
+    if phase == "null" and any(filters.get(key) for key, column in FILTER_COLUMNS.items() if column == sort_column):
+        return [] # 篩選條件已經限定這個欄位的值, 不會有 NULL
+    index = issue_list_index(conn, filters, sort_column, phase)
+    sql, params = build_issue_query(filters, sort_column, descending, phase, after, limit, index)
+    return conn.execute(sql, params).fetchall()
+
+def get_issues(conn, ids, filters=None):
+    """依 id 取列表欄位; 有 filters 時只回傳仍符合條件的列。"""
+    where, params = issue_filter_clause(filters or {})
+    rows = []
+    for chunk in chunked(list(ids)):
+        conditions = where + [f"id IN ({','.join('?' * len(chunk))})"]
+        rows += conn.execute(f"{ISSUE_LIST_SELECT} WHERE {' AND '.join(conditions)}", params + chunk).fetchall()
+    return rows
+
+ISSUE_TEXT_FIELDS = ("tracker", "subject", "status", "priority", "assignee", "description", "created_by")
+
+def normalize_issue_values(values):
+    """回傳型別與日期都已整理好的新 dict; 值不合法時丟 ValueError。
+
+    GUI、匯入與 API 新增的 issue 都經過這裡, 數字欄位不會存進文字 (之後排序 / 甘特圖才不會出錯)。
+    """
+    values = dict(values)
+    for column in ISSUE_TEXT_FIELDS:
+        if values.get(column) is not None and not isinstance(values[column], str):
+            raise ValueError(f"{column} must be text")
+    if not (values.get("subject") or "").strip():
+        raise ValueError("subject is required")
+    for column, convert in (("percent_done", int), ("estimated_hours", float)):
+        value = values.get(column)
+        if value is None or value == "":
+            values[column] = None
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"{column} must be a number")
+        try:
+            values[column] = convert(value)
+        except ValueError:
+            raise ValueError(f"{column} must be a number, not {value!r}") from None
+    if values["percent_done"] is not None and not 0 <= values["percent_done"] <= 100:
+        raise ValueError("% Done must be between 0 and 100")
+    for column in ("start_date", "due_date"):
+        values[column] = normalize_date(values.get(column))
+    values["created_at"] = normalize_timestamp(values.get("created_at")) or datetime.now().strftime(TIMESTAMP_FORMAT)
+    if values["start_date"] and values["due_date"] and values["start_date"] > values["due_date"]:
+        raise ValueError("Start date is after due date")
+    return values
+
+def create_issue(conn, values):
+    """values 為欄位名稱 -> 值 (見 ISSUE_FIELDS), 回傳新 issue 的 id。"""
+    return create_issues(conn, [values])[0]
+
+def create_issues(conn, records):
+    """一次新增多筆 (同一個交易, 任何一筆有錯就全部不新增), 回傳新 id 列表。"""
+    rows = [normalize_issue_values(values) for values in records]
+    with write_transaction(conn):
+        return [conn.execute(ISSUE_INSERT_SQL, tuple(values.get(field) for field in ISSUE_FIELDS)).lastrowid
+                for values in rows]
+
+ISSUE_DETAIL_FIELDS = ("id",) + ISSUE_FIELDS
+
+def load_issue_details(conn, ids):
+    """依 id 取完整欄位, 回傳 dict 列表 (順序同 ids, 不存在的 id 略過)。"""
+    found = {}
+    for chunk in chunked(list(ids)):
+        for row in conn.execute(f"SELECT {', '.join(ISSUE_DETAIL_FIELDS)} FROM issues "
+                                f"WHERE id IN ({','.join('?' * len(chunk))})", chunk):
+            found[row[0]] = dict(zip(ISSUE_DETAIL_FIELDS, row))
+    return [found[i] for i in ids if i in found]
+
+BULK_EDIT_FIELDS = ("status", "assignee", "priority", "percent_done")
+
+def check_bulk_changes(changes):
+    # 檢查批次修改的欄位與型別, 回傳整理好的 changes
+    unknown = set(changes) - set(BULK_EDIT_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot bulk edit: {', '.join(sorted(unknown))}")
+    for column, value in changes.items():
+        if column != "percent_done" and value is not None and not isinstance(value, str):
+            raise ValueError(f"{column} must be text")
+    if "percent_done" in changes and changes["percent_done"] is not None:
+        if isinstance(changes["percent_done"], bool) or not isinstance(changes["percent_done"], (int, str)):
+            raise ValueError("% Done must be a number")
+        changes = dict(changes, percent_done=int(changes["percent_done"]))
+        if not 0 <= changes["percent_done"] <= 100:
+            raise ValueError("% Done must be between 0 and 100")
+    return changes
+
+def bulk_update_issues(conn, ids, changes):
+    """把多個 issue 的欄位改成同一組值 (changes: 欄位 -> 值, 只限 BULK_EDIT_FIELDS)。
+
+    全部在一個交易內用 UPDATE ... WHERE id IN (...) 分批完成, 值本來就相同的列不會被更新
+    (不觸發 trigger, 也不寫 change_log)。回傳實際有改到的 id。
+    """
+    changes = check_bulk_changes(changes)
+    ids = list(ids)
+    if not changes or not ids:
+        return []
+    assignments = ", ".join(f"{column} = ?" for column in changes)
+    differs = " OR ".join(f"{column} IS NOT ?" for column in changes)
+    values = list(changes.values())
+    updated = []
+    with write_transaction(conn):
+        for chunk in chunked(ids, SQL_MAX_PARAMS - 2 * len(values)):
+            updated += [row[0] for row in conn.execute(
+                f"UPDATE issues SET {assignments} WHERE id IN ({','.join('?' * len(chunk))}) AND ({differs}) RETURNING id",
+                values + chunk + values)]
+    return updated
+
+def bulk_update_matching(conn, filters, changes):
+    """與 bulk_update_issues 相同, 但修改所有符合篩選條件 (見 issue_filter_clause) 的 issue。
+
+    列表只載入捲動範圍內的列, 「全部符合的」不必先把 id 全部查回來, 一個 UPDATE 就完成。
+    """
+    changes = check_bulk_changes(changes)
+    if not changes:
+        return []
+    where, params = issue_filter_clause(filters)
+    where.append("(" + " OR ".join(f"{column} IS NOT ?" for column in changes) + ")")
+    assignments = ", ".join(f"{column} = ?" for column in changes)
+    values = list(changes.values())
+    with write_transaction(conn):
+        return [row[0] for row in conn.execute(
+            f"UPDATE issues SET {assignments} WHERE {' AND '.join(where)} RETURNING id", values + params + values)]
+
+TIMELINE_MAX_ROWS = 500
+
+def list_timeline(conn, window_start, window_end, open_only=True, limit=TIMELINE_MAX_ROWS):
+    """回傳與 [window_start, window_end] (YYYY-MM-DD) 重疊的 issues, 依開始日排序。
+
+    只有設了 due_date 的 issue 畫得出來 (沒有 start_date 時當作一天)。
+    走 (due_date, start_date) 索引: 只掃 due_date >= 視窗起點的索引項目,
+    start_date 直接在索引裡判斷, 真正重疊的列才回表讀取。
+    每列為 (id, tracker, subject, status, assignee, start, due, percent_done)。
+    """
+    where = ["due_date >= ?", "(start_date <= ? OR (start_date IS NULL AND due_date <= ?))"]
+    params = [window_start, window_end, window_end]
+    if open_only:
+        where.append(f"status IN ({','.join('?' * len(OPEN_STATUSES))})")
+        params += OPEN_STATUSES
+    return conn.execute(f"SELECT id, tracker, subject, status, assignee, COALESCE(start_date, due_date), due_date, percent_done "
+                        f"FROM issues WHERE {' AND '.join(where)} ORDER BY COALESCE(start_date, due_date), id LIMIT ?",
+                        params + [limit]).fetchall()
+
+def load_issue_stats(conn):
+    # 只讀彙總表, 成本與分組數量有關, 與 issue 總數無關
+    return conn.execute("SELECT dimension, value, issue_count, estimated_hours FROM issue_stats "
+                        "WHERE issue_count > 0 ORDER BY dimension, issue_count DESC").fetchall()
+
+# ============================
+# Wiki 版本歷史
+# ============================
+WIKI_SNAPSHOT_EVERY = 16        # 每 16 個版本存一次完整內容, 其餘只存與前一版的差異
+WIKI_REVISION_CACHE_SIZE = 32   # 最近看過的版本保留在記憶體
+
+def make_delta(old, new):
+    """以行為單位計算 old -> new 的差異, 回傳 zlib 壓縮後的 JSON。
+
+    格式為操作列表: ["c", i, j] 複製舊版第 i~j 行, ["i", text] 插入新文字;
+    大小只跟改動的行數有關, 跟整頁長度無關。
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["c", i1, i2])
+        elif j2 > j1:
+            ops.append(["i", "".join(new_lines[j1:j2])])
+    return zlib.compress(json.dumps(ops, ensure_ascii=False).encode("utf-8"))
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(zlib.decompress(delta).decode("utf-8")):
+        if op[0] == "c":
+            parts.extend(old_lines[op[1]:op[2]])
+        else:
+            parts.append(op[1])
+    return "".join(parts)
+
+class RevisionCache:
+    """最近重建過的 wiki 版本 (LRU), key 為 (page_id, rev)。讀取與寫入執行緒共用, 所以加鎖。"""
+    def __init__(self, maxsize=WIKI_REVISION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+            return self.items.get(key)
+
+    def put(self, key, text):
+        with self.lock:
+            self.items[key] = text
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+wiki_revision_cache = RevisionCache()
+
+def get_start_page(conn):
+    # 目前只有一個入口頁: 最早建立的頁面, 回傳 (id, title, content) 或 None
+    return conn.execute("SELECT id, title, content FROM wiki ORDER BY id LIMIT 1").fetchone()
+
+def list_wiki_pages(conn):
+    return conn.execute("SELECT id, title, updated_by FROM wiki ORDER BY title").fetchall()
+
+def get_wiki_page(conn, title):
+    # 回傳 (id, title, content, updated_by) 或 None
+    return conn.execute("SELECT id, title, content, updated_by FROM wiki WHERE title=?", (title,)).fetchone()
+
+def list_wiki_revisions(conn, page_id):
+    return conn.execute("SELECT rev, author, created_at, kind, LENGTH(data) FROM wiki_revisions "
+                        "WHERE page_id=? ORDER BY rev DESC", (page_id,)).fetchall()
+
+def save_wiki_page(conn, title, content, author):
+    """儲存 wiki 頁面並新增一個版本 (同一個交易)。回傳 (page_id, rev)。
+
+    wiki.content 永遠是最新全文; wiki_revisions 只存與前一版的 delta,
+    每 WIKI_SNAPSHOT_EVERY 版 (或 delta 比全文還大時) 才存一次完整內容。
+    """
+    with write_transaction(conn):
+        page_id, rev = write_wiki_page(conn, title, content, author)
+    wiki_revision_cache.put((page_id, rev), content)
+    return page_id, rev
+
+def write_wiki_page(conn, title, content, author):
+    # save_wiki_page 的本體, 由呼叫端負責交易 (同步時整批一起提交)
+    row = conn.execute("SELECT id, content FROM wiki WHERE title=?", (title,)).fetchone()
+    if row:
+        page_id, old_content = row
+        conn.execute("UPDATE wiki SET content=?, updated_by=? WHERE id=?", (content, author, page_id))
+    else:
+        page_id = conn.execute("INSERT INTO wiki (title, content, updated_by) VALUES (?, ?, ?)",
+                               (title, content, author)).lastrowid
+        old_content = None
+    rev = conn.execute("SELECT COALESCE(MAX(rev), 0) + 1 FROM wiki_revisions WHERE page_id=?", (page_id,)).fetchone()[0]
+    full = zlib.compress(content.encode("utf-8"))
+    kind, data = "full", full
+    if old_content is not None and (rev - 1) % WIKI_SNAPSHOT_EVERY != 0:
+        delta = make_delta(old_content, content)
+        if len(delta) < len(full):
+            kind, data = "delta", delta
+    conn.execute("INSERT INTO wiki_revisions (page_id, rev, kind, data, author, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                 (page_id, rev, kind, data, author, datetime.now().strftime("%Y-%m-%d %H:%M")))
+    return page_id, rev
+
+def load_wiki_revision(conn, page_id, rev):
+    """重建指定版本: 從最近的完整版本 (或快取) 往後套用 delta, 最多 WIKI_SNAPSHOT_EVERY - 1 次。"""
+    cached = wiki_revision_cache.get((page_id, rev))
+    if cached is not None:
+        return cached
+    # 往回找最近的完整版本, 途中若遇到快取過的版本就從那裡開始
+    rows = conn.execute("SELECT rev, kind, data FROM wiki_revisions WHERE page_id=? AND rev<=? ORDER BY rev DESC LIMIT ?",
+                        (page_id, rev, WIKI_SNAPSHOT_EVERY)).fetchall()
+    chain = []
+    text = None
+    for row_rev, kind, data in rows:
+        cached = wiki_revision_cache.get((page_id, row_rev))
+        if cached is not None:
+            text = cached
+            break
+        if kind == "full":
+            text = zlib.decompress(data).decode("utf-8")
+            break
+        chain.append(data)
+    if text is None:
+        raise LookupError(f"Wiki revision {rev} of page {page_id} cannot be rebuilt")
+    for data in reversed(chain):
+        text = apply_delta(text, data)
+    wiki_revision_cache.put((page_id, rev), text)
+    return text
+
+# ============================
+# 全文搜尋 (FTS5)
+# ============================
+SEARCH_LIMIT = 50
+HIT_START, HIT_END = "\x02", "\x03"   # snippet / highlight 標記, 顯示時換成醒目樣式
+
+def fts_query(text):
+    # 每個詞加上引號 (使用者輸入的符號不會變成 FTS5 語法) 並做前綴比對
+    terms = [t.replace('"', '""') for t in text.split()]
+    return " ".join(f'"{t}"*' for t in terms)
+
+def search_all(conn, text, limit=SEARCH_LIMIT):
+    """搜尋 issues 與 wiki, 依 bm25 分數合併排序。
+
+    回傳 (種類, id, 標題, 摘要) 列表; 標題與摘要中的命中字以 HIT_START / HIT_END 包住。
+    """
+    query = fts_query(text)
+    if not query:
+        return []
+    # bm25 分數越小越相關; 標題命中的權重比內文高
+    issues = conn.execute('''
+        SELECT 'issue', rowid, highlight(issues_fts, 0, ?, ?), snippet(issues_fts, 1, ?, ?, '...', 16),
+               bm25(issues_fts, 10.0, 1.0) AS rank
+        FROM issues_fts WHERE issues_fts MATCH ? ORDER BY rank LIMIT ?
+    ''', (HIT_START, HIT_END, HIT_START, HIT_END, query, limit)).fetchall()
+    pages = conn.execute('''
+        SELECT 'wiki', rowid, highlight(wiki_fts, 0, ?, ?), snippet(wiki_fts, 1, ?, ?, '...', 16),
+               bm25(wiki_fts, 10.0, 1.0) AS rank
+        FROM wiki_fts WHERE wiki_fts MATCH ? ORDER BY rank LIMIT ?
+    ''', (HIT_START, HIT_END, HIT_START, HIT_END, query, limit)).fetchall()
+    results = sorted(issues + pages, key=lambda r: r[4])[:limit]
+    return [r[:4] for r in results]
+
+# ============================
+# 匯入 / 匯出 (CSV, JSONL)
+# ============================
+IMPORT_BATCH_SIZE = 5000       # 每個交易寫入的筆數
+EXPORT_PROGRESS_EVERY = 10000  # 匯出時每多少筆回報一次進度
+
+def is_jsonl(path):
+    return path.lower().endswith((".jsonl", ".ndjson"))
+
+def read_issue_records(path):
+    """依副檔名串流讀取 CSV / JSONL, 一次產生一筆 dict, 不會把整個檔案讀進記憶體。"""
+    if is_jsonl(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+
+def issue_record_values(record, line_no):
+    # 把一筆匯入資料轉成 INSERT 參數; 其他 tracker 匯出的 id 不沿用, 由資料庫重新編號
+    values = {field: None if record.get(field) == "" else record.get(field) for field in ISSUE_FIELDS}
+    try:
+        values = normalize_issue_values(values)
+    except ValueError as e:
+        raise ValueError(f"Record {line_no}: {e}") from None
+    return tuple(values[field] for field in ISSUE_FIELDS)
+
+def import_issues(conn, path, progress=None, batch_size=IMPORT_BATCH_SIZE):
+    """串流匯入 issues, 每 batch_size 筆用 executemany 寫入並提交一次。
+
+    已完成的筆數與該批資料記在同一個交易 (import_progress 表), 所以中途出錯
+    (例如某筆格式錯誤) 修正檔案後再匯入同一個檔案, 會從最後完成的批次繼續。
+    progress(n) 會在每批提交後收到目前累計筆數。回傳這次新增的筆數。
+    """
+    source = os.path.abspath(path)
+    row = conn.execute("SELECT rows_done FROM import_progress WHERE source=?", (source,)).fetchone()
+    done = row[0] if row else 0
+    records = itertools.islice(read_issue_records(path), done, None)
+    imported = 0
+    while True:
+        batch = [issue_record_values(r, done + i + 1) for i, r in enumerate(itertools.islice(records, batch_size))]
+        if not batch:
+            break
+        with write_transaction(conn):
+            conn.executemany(ISSUE_INSERT_SQL, batch)
+            conn.execute("INSERT INTO import_progress (source, rows_done) VALUES (?, ?) "
+                         "ON CONFLICT(source) DO UPDATE SET rows_done=excluded.rows_done", (source, done + len(batch)))
+        done += len(batch)
+        imported += len(batch)
+        if progress:
+            progress(done)
+    # 整個檔案完成, 下次再匯入同一個檔案就從頭開始
+    with write_transaction(conn):
+        conn.execute("DELETE FROM import_progress WHERE source=?", (source,))
+    return imported
+
+def export_issues(conn, path, progress=None):
+    """把所有 issues 串流寫到 CSV / JSONL。逐列走游標 (不用 fetchall), 記憶體用量固定。"""
+    columns = ("id",) + ISSUE_FIELDS
+    cur = conn.execute(f"SELECT {', '.join(columns)} FROM issues ORDER BY id")
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if is_jsonl(path):
+            write = lambda row: f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+        else:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            write = writer.writerow
+        for row in cur:
+            write(row)
+            count += 1
+            if progress and count % EXPORT_PROGRESS_EVERY == 0:
+                progress(count)
+    if progress:
+        progress(count)
+    return count
+
+# ============================
+# 附件 (Files)
+# ============================
+ATTACHMENTS_DIR = "attachments"     # 附件不放進 SQLite, 依 SHA-256 存在這個資料夾
+HASH_CHUNK_SIZE = 1024 * 1024       # 一次讀 1 MB, 大檔案也不會整個載入記憶體
+THUMBNAIL_SIZE = (240, 240)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp", ".tif", ".tiff")
+def attachment_path(sha256, store_dir=ATTACHMENTS_DIR):
+    # 用前兩碼分資料夾, 避免單一資料夾檔案過多
+    return os.path.join(store_dir, "objects", sha256[:2], sha256)
+
+def thumbnail_path(sha256, store_dir=ATTACHMENTS_DIR):
+    return os.path.join(store_dir, "thumbs", f"{sha256}.png")
+
+def store_attachment(src, store_dir=ATTACHMENTS_DIR):
+    """把檔案複製進附件庫並回傳 (sha256, size)。
+
+    複製時同時計算雜湊 (只讀一次檔案), 完成後才改名成雜湊檔名;
+    內容相同的檔案已經存在時直接丟掉這份暫存, 只保留一份。
+    """
+    os.makedirs(os.path.join(store_dir, "tmp"), exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(store_dir, "tmp", f"{os.getpid()}-{threading.get_ident()}-{os.path.basename(src)}")
+    try:
+        with open(src, "rb") as f, open(tmp_path, "wb") as out:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        final_path = attachment_path(sha256, store_dir)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return sha256, size
+
+def add_attachment(conn, filename, sha256, size, author):
+    with write_transaction(conn):
+        return conn.execute("INSERT INTO attachments (filename, sha256, size, uploaded_by, uploaded_at) VALUES (?, ?, ?, ?, ?)",
+                            (filename, sha256, size, author, datetime.now().strftime("%Y-%m-%d %H:%M"))).lastrowid
+
+def list_attachments(conn, after_id=None, limit=200):
+    # 以 id 做 keyset 分頁 (新的在前)
+    sql = "SELECT id, filename, sha256, size, uploaded_by, uploaded_at FROM attachments"
+    params = []
+    if after_id is not None:
+        sql += " WHERE id < ?"
+        params.append(after_id)
+    sql += " ORDER BY id DESC LIMIT ?"
+    return conn.execute(sql, params + [limit]).fetchall()
+
+def get_attachments(conn, ids):
+    rows = []
+    for chunk in chunked(list(ids)):
+        rows += conn.execute("SELECT id, filename, sha256, size, uploaded_by, uploaded_at FROM attachments "
+                             f"WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY id DESC", chunk).fetchall()
+    return rows
+
+def make_thumbnail(sha256, store_dir=ATTACHMENTS_DIR, size=THUMBNAIL_SIZE):
+    """產生縮圖並存到磁碟 (已存在就直接用)。在 process pool 中執行, 不佔用 UI 與 GIL。"""
+    from PIL import Image
+    dst = thumbnail_path(sha256, store_dir)
+    if not os.path.exists(dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        with Image.open(attachment_path(sha256, store_dir)) as image:
+            image.thumbnail(size)
+            tmp_path = f"{dst}.{os.getpid()}.tmp"
+            image.convert("RGBA").save(tmp_path, "PNG")
+            os.replace(tmp_path, dst)
+    return dst
+
+_thumbnail_pool = None
+
+def thumbnail_pool():
+    # 第一次需要縮圖時才啟動 process pool
+    global _thumbnail_pool
+    if _thumbnail_pool is None:
+        _thumbnail_pool = ProcessPoolExecutor(max_workers=max(1, min(4, (os.cpu_count() or 2) - 1)))
+    return _thumbnail_pool
+
+def shutdown_thumbnail_pool():
+    global _thumbnail_pool
+    if _thumbnail_pool is not None:
+        _thumbnail_pool.shutdown(wait=False, cancel_futures=True)
+        _thumbnail_pool = None
+
+
+# ============================
+# 離線同步
+# ============================
+# 每一列都有版本 (Lamport 時鐘 version, 寫入的 site_id); 兩邊都改過同一列時 (version, site) 較大的勝出,
+# 不論誰先同步、同步幾次結果都相同。row_versions.seq 是本機的變更序號, 同步時只取對方上次之後的變更,
+# 成本與變更筆數有關, 與資料庫大小無關。
+SYNC_BATCH_ROWS = 2000      # 每批讀取 / 套用 (一個交易) 的筆數
+SYNC_SEGMENT_PATTERN = re.compile(r"^(\d+)-(\d+)\.jsonl\.gz$")
+WIKI_SYNC_FIELDS = ("title", "content", "updated_by")
+USER_SYNC_FIELDS = ("username", "password")
+
+def site_id(conn):
+    return conn.execute("SELECT value FROM sync_state WHERE key = 'site_id'").fetchone()[0]
+
+def reset_site_id(conn):
+    """換一個新的 site_id。直接複製 DB 檔給另一台時, 複本要先執行一次, 兩台才分得出彼此的修改。"""
+    with write_transaction(conn):
+        conn.execute("UPDATE sync_state SET value = lower(hex(randomblob(8))) WHERE key = 'site_id'")
+    return site_id(conn)
+
+def received_seq(conn, peer_site):
+    row = conn.execute("SELECT received_seq FROM sync_peers WHERE site=?", (peer_site,)).fetchone()
+    return row[0] if row else 0
+
+def read_sync_changes(conn, after_seq, exclude_sites=(), limit=SYNC_BATCH_ROWS):
+    """讀取序號 after_seq 之後的最多 limit 筆變更, 回傳 (讀到的最後序號, 變更列表)。
+
+    每筆變更是 dict: table / uid / version / site / deleted / seq / data (該列目前的內容, 刪除時為 None)。
+    版本由 exclude_sites 寫入的列不回傳 (對方本來就有同版或更新的版本), 但序號照樣前進。
+    """
+    # 版本與內容在同一個讀取交易中取得, 中途有人寫入也不會不一致
+    conn.execute("BEGIN")
+    try:
+        rows = conn.execute("SELECT tbl, uid, row_id, version, site, deleted, seq FROM row_versions "
+                            "WHERE seq > ? ORDER BY seq LIMIT ?", (after_seq, limit)).fetchall()
+        if not rows:
+            return after_seq, []
+        last_seq = rows[-1][6]
+        rows = [row for row in rows if row[4] not in exclude_sites]
+        live = {}
+        for tbl, _, row_id, _, _, deleted, _ in rows:
+            if not deleted:
+                live.setdefault(tbl, []).append(row_id)
+        data = {}
+        for tbl, key, fields in (("issues", "id", ISSUE_FIELDS), ("wiki", "id", WIKI_SYNC_FIELDS),
+                                 ("users", "username", USER_SYNC_FIELDS)):
+            for chunk in chunked(live.get(tbl, [])):
+                for row in conn.execute(f"SELECT {key}, {', '.join(fields)} FROM {tbl} "
+                                        f"WHERE {key} IN ({','.join('?' * len(chunk))})", chunk):
+                    data[(tbl, row[0])] = dict(zip(fields, row[1:]))
+        changes = [{"table": tbl, "uid": uid, "version": version, "site": site, "deleted": bool(deleted),
+                    "seq": seq, "data": None if deleted else data.get((tbl, row_id))}
+                   for tbl, uid, row_id, version, site, deleted, seq in rows]
+        return last_seq, changes
+    finally:
+        conn.commit()
+
+def apply_sync_row(conn, change, row_id):
+    # 把一筆變更寫進資料表, 回傳本機的 row_id (刪除後為 None)。row_id 為目前存在的本機列或 None
+    table, data = change["table"], change["data"]
+    if table == "issues":
+        if change["deleted"]:
+            conn.execute("DELETE FROM issues WHERE id=?", (row_id,))
+            return None
+        values = [data.get(field) for field in ISSUE_FIELDS]
+        if row_id is None:
+            return conn.execute(ISSUE_INSERT_SQL, values).lastrowid
+        conn.execute(f"UPDATE issues SET {', '.join(f'{field}=?' for field in ISSUE_FIELDS)} WHERE id=?", values + [row_id])
+        return row_id
+    if table == "wiki":
+        if change["deleted"]:
+            conn.execute("DELETE FROM wiki_revisions WHERE page_id=?", (row_id,))
+            conn.execute("DELETE FROM wiki WHERE id=?", (row_id,))
+            return None
+        # 走一般的存檔流程, 同步進來的修改也會留下版本歷史
+        return write_wiki_page(conn, change["uid"], data["content"] or "", data["updated_by"])[0]
+    if change["deleted"]:
+        conn.execute("DELETE FROM users WHERE username=?", (change["uid"],))
+        return None
+    conn.execute("INSERT INTO users (username, password) VALUES (?, ?) "
+                 "ON CONFLICT (username) DO UPDATE SET password=excluded.password", (change["uid"], data["password"]))
+    return change["uid"]
+
+def apply_sync_changes(conn, source_site, last_seq, changes):
+    """在一個交易內套用 source_site 送來的變更, 並把同步點記到 last_seq。回傳實際套用的筆數。
+
+    本機版本 (version, site) 較大或相同的列略過; 套用後該列沿用對方的版本,
+    但取得新的本機序號, 之後也會再轉送給其他 site。
+    """
+    local_site = site_id(conn)
+    applied = []
+    with write_transaction(conn):
+        for change in changes:
+            if change["site"] == local_site:
+                continue
+            current = conn.execute("SELECT row_id, version, site, deleted FROM row_versions WHERE tbl=? AND uid=?",
+                                   (change["table"], change["uid"])).fetchone()
+            if current and (current[1], current[2]) >= (change["version"], change["site"]):
+                continue
+            if change["deleted"] and (not current or current[3]):
+                row_id = None
+            else:
+                row_id = apply_sync_row(conn, change, current[0] if current and not current[3] else None)
+            # trigger 記下的是本機版本, 改回對方的版本 (新增 issue 時 trigger 給的 uid 也換成對方的)
+            if change["table"] == "issues" and row_id is not None:
+                conn.execute("DELETE FROM row_versions WHERE tbl='issues' AND row_id=? AND uid!=?", (row_id, change["uid"]))
+            conn.execute("UPDATE sync_state SET value = value + 1 WHERE key = 'seq'")
+            conn.execute("INSERT INTO row_versions SELECT ?, ?, ?, ?, ?, ?, seq FROM sync_stamp WHERE true "
+                         "ON CONFLICT (tbl, uid) DO UPDATE SET row_id=excluded.row_id, version=excluded.version, "
+                         "site=excluded.site, deleted=excluded.deleted, seq=excluded.seq",
+                         (change["table"], change["uid"], row_id if row_id is not None else (current and current[0]),
+                          change["version"], change["site"], int(change["deleted"])))
+            applied.append(change)
+        if applied:
+            # Lamport 時鐘: 之後本機的修改一定比收到的版本新
+            conn.execute("UPDATE sync_state SET value = MAX(value, ?) WHERE key = 'clock'",
+                         (max(change["version"] for change in applied),))
+        conn.execute("INSERT INTO sync_peers (site, received_seq, synced_at) VALUES (?, ?, ?) "
+                     "ON CONFLICT (site) DO UPDATE SET received_seq=MAX(received_seq, excluded.received_seq), "
+                     "synced_at=excluded.synced_at",
+                     (source_site, last_seq, datetime.now().strftime(TIMESTAMP_FORMAT)))
+    return len(applied)
+
+def transfer_changes(source, target, batch_size=SYNC_BATCH_ROWS):
+    # 把 source 上 target 還沒收到的變更送過去, 每批一個交易 (中斷後下次從最後一批繼續)
+    source_site, target_site = site_id(source), site_id(target)
+    after = received_seq(target, source_site)
+    applied = 0
+    while True:
+        last_seq, changes = read_sync_changes(source, after, (target_site,), batch_size)
+        if last_seq == after:
+            return applied
+        applied += apply_sync_changes(target, source_site, last_seq, changes)
+        after = last_seq
+
+def sync_databases(conn, other, batch_size=SYNC_BATCH_ROWS):
+    """與另一個資料庫檔雙向同步, 回傳 (收到的筆數, 送出的筆數)。"""
+    if site_id(conn) == site_id(other):
+        raise ValueError("Both databases have the same site id (one is a copy of the other); "
+                         "give the copy a new one with: sync --new-site-id")
+    pulled = transfer_changes(other, conn, batch_size)
+    pushed = transfer_changes(conn, other, batch_size)
+    return pulled, pushed
+
+def list_sync_segments(folder):
+    # 回傳 [(第一個序號, 最後序號, 路徑)], 依序號排序
+    segments = []
+    for name in os.listdir(folder):
+        match = SYNC_SEGMENT_PATTERN.match(name)
+        if match:
+            segments.append((int(match.group(1)), int(match.group(2)), os.path.join(folder, name)))
+    return sorted(segments)
+
+def sync_directory(conn, directory, batch_size=SYNC_BATCH_ROWS):
+    """透過共用資料夾 (隨身碟、網路磁碟) 同步, 回傳 (收到的筆數, 送出的筆數)。
+
+    每個 site 把自己的變更寫在 directory/<site_id>/ 下的壓縮檔 (檔名是序號範圍, 寫入後不再修改),
+    讀取其他 site 的資料夾時跳過已經收過的檔案。
+    """
+    local_site = site_id(conn)
+    own_folder = os.path.join(directory, local_site)
+    os.makedirs(own_folder, exist_ok=True)
+    peers = [name for name in sorted(os.listdir(directory))
+             if name != local_site and os.path.isdir(os.path.join(directory, name))]
+    pulled = 0
+    for peer in peers:
+        after = received_seq(conn, peer)
+        for first, last, path in list_sync_segments(os.path.join(directory, peer)):
+            if last <= after:
+                continue
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                changes = [change for change in map(json.loads, f) if change["seq"] > after]
+            pulled += apply_sync_changes(conn, peer, last, changes)
+            after = last
+    # 在資料夾裡有自己檔案的 site 會自己發布, 它們寫入的版本不必再轉送一次
+    segments = list_sync_segments(own_folder)
+    after = segments[-1][1] if segments else 0
+    pushed = 0
+    while True:
+        last_seq, changes = read_sync_changes(conn, after, peers, batch_size)
+        if last_seq == after:
+            return pulled, pushed
+        path = os.path.join(own_folder, f"{after + 1:012d}-{last_seq:012d}.jsonl.gz")
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            for change in changes:
+                f.write(json.dumps(change, ensure_ascii=False) + "\n")
+        os.replace(path + ".tmp", path)
+        pushed += len(changes)
+        after = last_seq
@@ -0,0 +1,359 @@
+"""MTD_Workplace 本機 JSON API (不需要 GUI)。
+
+給腳本 / CI 用: 只綁 127.0.0.1, 以 asyncio 處理 HTTP/1.1 (支援 keep-alive),
+SQL 則交給連線池 (多個讀取執行緒各自一條連線 + 一個寫入執行緒) 執行。
+資料庫是 WAL 模式, 可以和開著的 GUI 同時使用同一個 redmine_lite.db;
+這裡寫入的變更會經由 change_log 出現在 GUI 上。
+
+GET 回應帶 ETag (change_log 最新的 seq), 用 If-None-Match 查詢時若資料庫沒有任何變更就回 304。
+
+    GET  /api/issues?status=open&assignee=bob&sort=created_at&desc=1&limit=100&cursor=...
+    GET  /api/issues?ids=1,2,3            GET  /api/issues/<id>
+    POST /api/issues                      POST /api/issues/batch  ([{...}, ...])
+    POST /api/issues/bulk-update          ({"ids": [...], "changes": {"status": "Closed"}})
+    GET  /api/wiki                        GET / PUT /api/wiki/<title>  ({"content": "...", "author": "..."})
+    GET  /api/users?prefix=a              POST /api/users  ({"username": "...", "password": "..."})
+    GET  /api/search?q=...                (title / snippet 為純文字, title_matches / snippet_matches 為命中處的 [起, 迄) 字元位置)
+
+用法: python server.py --db redmine_lite.db --port 8765   (或 python app.py serve)
+"""
+import argparse
+import asyncio
+import base64
+import json
+import re
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from repository import (
+    DB_PATH, ISSUE_PAGE_SIZE, ISSUE_LIST_COLUMNS,
+    open_connection, connect, latest_change_seq, prune_change_log,
+    register_user, list_usernames_with_prefix,
+    issue_sort_phases, list_issues, create_issue, create_issues, load_issue_details, bulk_update_issues,
+    list_wiki_pages, get_wiki_page, save_wiki_page, search_all, HIT_START, HIT_END,
+)
+
+API_HOST = "127.0.0.1"     # 沒有登入驗證, 只接受本機連線
+API_PORT = 8765
+API_READERS = 4            # 讀取執行緒 (各自一條連線) 數量
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_ITEMS = 10000
+
+# 列表列的欄位順序 (與 ISSUE_LIST_SELECT 相同)
+LIST_FIELDS = tuple(ISSUE_LIST_COLUMNS.values())
+FILTER_PARAMS = ("status", "tracker", "priority", "assignee", "created_from", "created_to", "due")
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class ConnectionPool:
+    """讀取用多個執行緒 (每個執行緒第一次用到時開自己的連線), 寫入用單一執行緒依序執行。
+
+    WAL 下讀取不會等寫入; 寫入集中在一條連線, 不會互相搶鎖。
+    """
+    def __init__(self, db_path, readers=API_READERS):
+        self.db_path = db_path
+        conn = connect(db_path)  # 先升級好資料庫結構, 順便清掉舊的變更紀錄
+        prune_change_log(conn)
+        conn.close()
+        self.local = threading.local()
+        self.read_pool = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="api-reader")
+        self.write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-writer")
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = open_connection(self.db_path)
+        return conn
+
+    def read(self, job, *args):
+        return asyncio.get_running_loop().run_in_executor(self.read_pool, lambda: job(self.connection(), *args))
+
+    def write(self, job, *args):
+        return asyncio.get_running_loop().run_in_executor(self.write_pool, lambda: job(self.connection(), *args))
+
+    def close(self):
+        self.read_pool.shutdown()
+        self.write_pool.shutdown()
+
+# ============================
+# 參數 / 分頁
+# ============================
+def encode_cursor(phase_index, after):
+    return base64.urlsafe_b64encode(json.dumps([phase_index, *after]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        phase_index, value, issue_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(phase_index), (value, int(issue_id))
+    except (ValueError, TypeError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid cursor") from None
+
+def int_param(query, name, default, low, high):
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer") from None
+    return max(low, min(high, value))
+
+def parse_ids(text):
+    try:
+        return [int(part) for part in text.split(",") if part.strip()]
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "ids must be comma separated integers") from None
+
+def json_body(body, expected):
+    try:
+        data = json.loads(body or b"null")
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON") from None
+    if not isinstance(data, expected):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Body must be a JSON {'array' if expected is list else 'object'}")
+    return data
+
+# ============================
+# 各端點 (在連線池的執行緒上執行, 第一個參數是該執行緒的連線)
+# ============================
+def get_issue_list(conn, query, body):
+    if "ids" in query:
+        ids = parse_ids(query["ids"])[:MAX_BATCH_ITEMS]
+        return HTTPStatus.OK, {"issues": load_issue_details(conn, ids)}
+    filters = {key: query.get(key) or None for key in FILTER_PARAMS}
+    sort = query.get("sort", "id")
+    if sort not in LIST_FIELDS:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"sort must be one of {', '.join(LIST_FIELDS)}")
+    descending = query.get("desc", "1" if sort == "id" else "0") not in ("0", "false")
+    limit = int_param(query, "limit", ISSUE_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    phases = issue_sort_phases(sort, descending)
+    phase_index, after = decode_cursor(query["cursor"]) if query.get("cursor") else (0, None)
+    if not 0 <= phase_index < len(phases):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid cursor")
+    # 與 IssuesView 相同的 keyset 分頁: 這一段取完才換下一段 (NULL 值的列)
+    rows = []
+    while len(rows) < limit and phase_index < len(phases):
+        page = list_issues(conn, filters, sort, descending, phases[phase_index], after, limit - len(rows))
+        rows += page
+        if len(rows) < limit:
+            phase_index, after = phase_index + 1, None
+        else:
+            after = (page[-1][LIST_FIELDS.index(sort)], page[-1][0])
+    next_cursor = encode_cursor(phase_index, after) if phase_index < len(phases) and after else None
+    return HTTPStatus.OK, {"issues": [dict(zip(LIST_FIELDS, row)) for row in rows], "next": next_cursor}
+
+def get_issue(conn, query, body, issue_id):
+    found = load_issue_details(conn, [int(issue_id)])
+    if not found:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"Issue {issue_id} not found")
+    return HTTPStatus.OK, found[0]
+
+def post_issue(conn, query, body):
+    return HTTPStatus.CREATED, {"id": create_issue(conn, json_body(body, dict))}
+
+def post_issue_batch(conn, query, body):
+    records = json_body(body, list)
+    if len(records) > MAX_BATCH_ITEMS:
+        raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"At most {MAX_BATCH_ITEMS} issues per batch")
+    if not all(isinstance(r, dict) for r in records):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Every issue must be a JSON object")
+    return HTTPStatus.CREATED, {"ids": create_issues(conn, records)}
+
+def post_bulk_update(conn, query, body):
+    data = json_body(body, dict)
+    ids, changes = data.get("ids"), data.get("changes")
+    if not isinstance(ids, list) or not isinstance(changes, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, 'Body must be {"ids": [...], "changes": {...}}')
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "ids must be integers")
+    return HTTPStatus.OK, {"updated": bulk_update_issues(conn, ids, changes)}
+
+def get_wiki_list(conn, query, body):
+    return HTTPStatus.OK, {"pages": [{"id": i, "title": t, "updated_by": u} for i, t, u in list_wiki_pages(conn)]}
+
+def get_wiki(conn, query, body, title):
+    row = get_wiki_page(conn, title)
+    if row is None:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"Wiki page {title!r} not found")
+    return HTTPStatus.OK, dict(zip(("id", "title", "content", "updated_by"), row))
+
+def put_wiki(conn, query, body, title):
+    data = json_body(body, dict)
+    if not isinstance(data.get("content"), str):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "content is required")
+    if not isinstance(data.get("author") or "", str):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "author must be a string")
+    page_id, rev = save_wiki_page(conn, title, data["content"], data.get("author") or "api")
+    return HTTPStatus.OK, {"id": page_id, "rev": rev}
+
+def get_users(conn, query, body):
+    return HTTPStatus.OK, {"users": list_usernames_with_prefix(conn, query.get("prefix", ""))}
+
+def post_user(conn, query, body):
+    data = json_body(body, dict)
+    if not all(isinstance(data.get(key), str) and data[key] for key in ("username", "password")):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "username and password are required strings")
+    if not register_user(conn, data["username"], data["password"]):
+        raise ApiError(HTTPStatus.CONFLICT, "User already exists")
+    return HTTPStatus.CREATED, {"username": data["username"]}
+
+def split_hits(text):
+    # 拿掉 GUI 用的 HIT_START / HIT_END 標記, 回傳 (純文字, [[起, 迄), ...])
+    plain, matches = "", []
+    for i, part in enumerate(text.split(HIT_START)):
+        hit, _, rest = part.partition(HIT_END) if i else ("", "", part)
+        if hit:
+            matches.append([len(plain), len(plain) + len(hit)])
+        plain += hit + rest
+    return plain, matches
+
+def get_search(conn, query, body):
+    results = []
+    for kind, row_id, title, snippet in search_all(conn, query.get("q", "")):
+        title, title_matches = split_hits(title or "")
+        snippet, snippet_matches = split_hits(snippet or "")
+        results.append({"kind": kind, "id": row_id, "title": title, "title_matches": title_matches,
+                        "snippet": snippet, "snippet_matches": snippet_matches})
+    return HTTPStatus.OK, {"results": results}
+
+# (method, 路徑, 處理函式, 是否寫入); 路徑中的 (...) 會當成參數傳給處理函式
+ROUTES = [
+    ("GET", r"/api/issues", get_issue_list, False),
+    ("POST", r"/api/issues", post_issue, True),
+    ("POST", r"/api/issues/batch", post_issue_batch, True),
+    ("POST", r"/api/issues/bulk-update", post_bulk_update, True),
+    ("GET", r"/api/issues/(\d+)", get_issue, False),
+    ("GET", r"/api/wiki", get_wiki_list, False),
+    ("GET", r"/api/wiki/(.+)", get_wiki, False),
+    ("PUT", r"/api/wiki/(.+)", put_wiki, True),
+    ("GET", r"/api/users", get_users, False),
+    ("POST", r"/api/users", post_user, True),
+    ("GET", r"/api/search", get_search, False),
+]
+ROUTES = [(method, re.compile(pattern + "$"), handler, write) for method, pattern, handler, write in ROUTES]
+
+# ============================
+# HTTP
+# ============================
+class ApiServer:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload, extra = await self.dispatch(method, target, headers, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.respond(writer, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip("/")
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        allowed = []
+        for route_method, pattern, handler, write in ROUTES:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed.append(route_method)
+                continue
+            try:
+                if write:
+                    status, payload = await self.pool.write(handler, query, body, *match.groups())
+                    return status, payload, {}
+                # 資料庫沒變 (seq 相同) 就不必再查; seq 在查詢前讀取, 最壞只是讓客戶端多查一次
+                etag = f'"{await self.pool.read(latest_change_seq)}"'
+                if headers.get("if-none-match") == etag:
+                    return HTTPStatus.NOT_MODIFIED, None, {"ETag": etag}
+                status, payload = await self.pool.read(handler, query, body, *match.groups())
+                return status, payload, {"ETag": etag}
+            except ApiError as e:
+                return e.status, {"error": str(e)}, {}
+            except (ValueError, LookupError) as e:
+                return HTTPStatus.BAD_REQUEST, {"error": str(e)}, {}
+            except sqlite3.IntegrityError as e:
+                return HTTPStatus.CONFLICT, {"error": str(e)}, {}
+            except sqlite3.OperationalError as e:
+                return HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)}, {"Retry-After": "1"}
+            except Exception as e:
+                print(f"{method} {target}: {e!r}", file=sys.stderr)
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal error"}, {}
+        if allowed:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Method not allowed"}, {"Allow": ", ".join(allowed)}
+        return HTTPStatus.NOT_FOUND, {"error": f"No route for {path}"}, {}
+
+    async def respond(self, writer, status, payload, extra=None, keep_alive=True):
+        data = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Length: {len(data)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if payload is not None:
+            lines.append("Content-Type: application/json; charset=utf-8")
+        lines += [f"{name}: {value}" for name, value in (extra or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data)
+        await writer.drain()
+
+async def run_server(db_path, port, readers):
+    pool = ConnectionPool(db_path, readers)
+    api = ApiServer(pool)
+    server = await asyncio.start_server(api.handle_client, API_HOST, port)
+    print(f"Serving {db_path} on http://{API_HOST}:{port}/api (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        pool.close()
+
+def serve(db_path=DB_PATH, port=API_PORT, readers=API_READERS):
+    try:
+        asyncio.run(run_server(db_path, port, readers))
+    except KeyboardInterrupt:
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MTD_Workplace local JSON API")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--readers", type=int, default=API_READERS, help="reader threads / connections")
+    args = parser.parse_args(argv)
+    serve(args.db, args.port, args.readers)
+
+if __name__ == "__main__":
+    main()